@@ -0,0 +1,256 @@
+"""
+Compiled Kernels
+Optional Numba-accelerated kernels for the Monte Carlo engine
+
+Numba is an optional dependency: every kernel here has a NumPy fallback,
+selected automatically when Numba is not installed.
+
+Copyright (c) 2025 eesb99@gmail.com
+Licensed under the MIT License - see LICENSE file for details
+DMCA-Free: Original work
+"""
+
+import math
+
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    from numba import njit, prange, vectorize
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    NUMBA_AVAILABLE = False
+    prange = range
+    vectorize = None
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that leaves the function uncompiled"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Simulations per accumulator in the parallel moment reduction
+MOMENT_CHUNK_SIZE = 4096
+
+
+@njit(parallel=True, cache=True)
+def _moments_jit(values, chunk_size):
+    """Chunked Welford accumulators run in parallel, then merged with Chan's formulas"""
+    n = values.shape[0]
+    num_chunks = (n + chunk_size - 1) // chunk_size
+
+    counts = np.zeros(num_chunks)
+    means = np.zeros(num_chunks)
+    m2s = np.zeros(num_chunks)
+    m3s = np.zeros(num_chunks)
+    m4s = np.zeros(num_chunks)
+    mins = np.empty(num_chunks)
+    maxs = np.empty(num_chunks)
+
+    for c in prange(num_chunks):
+        start = c * chunk_size
+        stop = min(start + chunk_size, n)
+        count = 0.0
+        mean = 0.0
+        m2 = 0.0
+        m3 = 0.0
+        m4 = 0.0
+        lo = values[start]
+        hi = values[start]
+        for i in range(start, stop):
+            x = values[i]
+            prev = count
+            count += 1.0
+            delta = x - mean
+            delta_n = delta / count
+            delta_n2 = delta_n * delta_n
+            term = delta * delta_n * prev
+            mean += delta_n
+            m4 += term * delta_n2 * (count * count - 3.0 * count + 3.0) + 6.0 * delta_n2 * m2 - 4.0 * delta_n * m3
+            m3 += term * delta_n * (count - 2.0) - 3.0 * delta_n * m2
+            m2 += term
+            if x < lo:
+                lo = x
+            if x > hi:
+                hi = x
+        counts[c] = count
+        means[c] = mean
+        m2s[c] = m2
+        m3s[c] = m3
+        m4s[c] = m4
+        mins[c] = lo
+        maxs[c] = hi
+
+    count = counts[0]
+    mean = means[0]
+    m2 = m2s[0]
+    m3 = m3s[0]
+    m4 = m4s[0]
+    lo = mins[0]
+    hi = maxs[0]
+    for c in range(1, num_chunks):
+        nb = counts[c]
+        na = count
+        total = na + nb
+        delta = means[c] - mean
+        delta2 = delta * delta
+        m4 = (m4 + m4s[c]
+              + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / (total * total * total)
+              + 6.0 * delta2 * (na * na * m2s[c] + nb * nb * m2) / (total * total)
+              + 4.0 * delta * (na * m3s[c] - nb * m3) / total)
+        m3 = (m3 + m3s[c]
+              + delta2 * delta * na * nb * (na - nb) / (total * total)
+              + 3.0 * delta * (na * m2s[c] - nb * m2) / total)
+        m2 = m2 + m2s[c] + delta2 * na * nb / total
+        mean = mean + delta * nb / total
+        count = total
+        lo = min(lo, mins[c])
+        hi = max(hi, maxs[c])
+
+    return count, mean, m2, m3, m4, lo, hi
+
+
+def _moments_numpy(values: np.ndarray) -> Tuple[float, ...]:
+    """NumPy fallback for moments()"""
+    mean = values.mean()
+    centered = values - mean
+    squared = centered * centered
+    return (
+        float(values.shape[0]),
+        float(mean),
+        float(squared.sum()),
+        float(np.dot(squared, centered)),
+        float(np.dot(squared, squared)),
+        float(values.min()),
+        float(values.max())
+    )
+
+
+def merge_moments(a: Tuple[float, ...], b: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Combine two moments() results as if computed over the concatenated data"""
+    na, mean_a, m2a, m3a, m4a, lo_a, hi_a = a
+    nb, mean_b, m2b, m3b, m4b, lo_b, hi_b = b
+    n = na + nb
+    delta = mean_b - mean_a
+    delta2 = delta * delta
+
+    m4 = (m4a + m4b
+          + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+          + 6.0 * delta2 * (na * na * m2b + nb * nb * m2a) / n ** 2
+          + 4.0 * delta * (na * m3b - nb * m3a) / n)
+    m3 = (m3a + m3b
+          + delta2 * delta * na * nb * (na - nb) / n ** 2
+          + 3.0 * delta * (na * m2b - nb * m2a) / n)
+    m2 = m2a + m2b + delta2 * na * nb / n
+
+    return (n, mean_a + delta * nb / n, m2, m3, m4, min(lo_a, lo_b), max(hi_a, hi_b))
+
+
+def moments(values: np.ndarray) -> Tuple[float, ...]:
+    """
+    Central moment sums of a 1-D array in a single streaming pass
+
+    Returns:
+        (n, mean, M2, M3, M4, min, max) where Mk is the sum of (x - mean)^k
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.size == 0:
+        raise ValueError("moments() requires at least one value")
+    if NUMBA_AVAILABLE:
+        return _moments_jit(values, MOMENT_CHUNK_SIZE)
+    return _moments_numpy(values)
+
+
+# Coefficients of Acklam's rational approximation to the standard normal inverse CDF
+_ACKLAM_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+             1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_ACKLAM_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+             6.680131188771972e+01, -1.328068155288572e+01)
+_ACKLAM_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+             -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_ACKLAM_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+             3.754408661907416e+00)
+_ACKLAM_LOW = 0.02425
+
+
+@njit(cache=True)
+def _ndtri_scalar(p):
+    """Standard normal inverse CDF: Acklam's approximation plus one Halley step"""
+    if p <= 0.0:
+        return -math.inf
+    if p >= 1.0:
+        return math.inf
+
+    # Work in the lower tail (1 - p is exact for p >= 0.5) so the refinement
+    # residual below never suffers cancellation
+    upper = p > 0.5
+    if upper:
+        p = 1.0 - p
+
+    if p < _ACKLAM_LOW:
+        c, d = _ACKLAM_C, _ACKLAM_D
+        q = math.sqrt(-2.0 * math.log(p))
+        x = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / \
+            ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1.0)
+    else:
+        a, b = _ACKLAM_A, _ACKLAM_B
+        q = p - 0.5
+        r = q * q
+        x = (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * q / \
+            (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1.0)
+
+    # Halley refinement brings the ~1e-9 approximation to full double precision
+    e = 0.5 * math.erfc(-x / math.sqrt(2.0)) - p
+    u = e * math.sqrt(2.0 * math.pi) * math.exp(x * x / 2.0)
+    x = x - u / (1.0 + x * u / 2.0)
+
+    return -x if upper else x
+
+
+def _normal_ppf(u, mean, std):
+    return mean + std * _ndtri_scalar(u)
+
+
+def _lognormal_ppf(u, mean, sigma):
+    return math.exp(mean + sigma * _ndtri_scalar(u))
+
+
+def _exponential_ppf(u, scale):
+    return -scale * math.log1p(-u)
+
+
+def _triangular_ppf(u, left, mode, right):
+    width = right - left
+    if u * width < mode - left:
+        return left + math.sqrt(u * width * (mode - left))
+    return right - math.sqrt((1.0 - u) * width * (right - mode))
+
+
+# Closed-form inverse CDFs that compile to ufuncs, with their number of parameters
+_PPF_KERNELS: Dict[str, Tuple[Callable, int]] = {
+    'normal': (_normal_ppf, 2),
+    'lognormal': (_lognormal_ppf, 2),
+    'exponential': (_exponential_ppf, 1),
+    'triangular': (_triangular_ppf, 3),
+}
+
+_PPF_UFUNCS: Dict[str, Callable] = {}
+
+
+def ppf_ufunc(distribution: str) -> Optional[Callable]:
+    """
+    Multi-threaded inverse-CDF ufunc (u, *params) for a distribution name
+
+    Compiled on first use and cached per process. Returns None when Numba
+    is unavailable or the distribution has no closed-form kernel.
+    """
+    if not NUMBA_AVAILABLE or distribution not in _PPF_KERNELS:
+        return None
+
+    if distribution not in _PPF_UFUNCS:
+        func, num_params = _PPF_KERNELS[distribution]
+        signature = 'float64(' + ', '.join(['float64'] * (num_params + 1)) + ')'
+        _PPF_UFUNCS[distribution] = vectorize([signature], target='parallel')(func)
+
+    return _PPF_UFUNCS[distribution]
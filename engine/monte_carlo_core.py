@@ -7,12 +7,38 @@ Licensed under the MIT License - see LICENSE file for details
 DMCA-Free: Original work
 """
 
+import logging
+import math
+import os
+import re
+import warnings
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
 from scipy import stats
-from typing import Dict, List, Tuple, Any, Optional, Callable
+from scipy.linalg.blas import dtrmm
+from scipy.special import ndtr, ndtri
+from scipy.stats import qmc
+from typing import Dict, List, Tuple, Any, Optional, Callable, Union
 from dataclasses import dataclass
 from enum import Enum
 
+from engine.kernels import merge_moments, moments, ppf_ufunc
+
+try:
+    from joblib import Parallel, delayed
+    JOBLIB_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    JOBLIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# NumPy errors raised when scalar-only code (float(), math.*, branching on values)
+# is handed arrays; only these make vectorized=None fall back to per-simulation calls
+_SCALAR_ONLY_ERROR = re.compile(r"truth value of an array|converted to (a )?(Python )?scalar")
+
 
 class DistributionType(Enum):
     """Supported probability distributions"""
@@ -25,6 +51,133 @@ class DistributionType(Enum):
     GAMMA = "gamma"
 
 
+# Positional parameters of each distribution, in the order the samplers below take them
+_PARAM_KEYS: Dict[DistributionType, Tuple[str, ...]] = {
+    DistributionType.NORMAL: ('mean', 'std'),
+    DistributionType.LOGNORMAL: ('mean', 'sigma'),
+    DistributionType.UNIFORM: ('low', 'high'),
+    DistributionType.TRIANGULAR: ('left', 'mode', 'right'),
+    DistributionType.EXPONENTIAL: ('scale',),
+    DistributionType.BETA: ('a', 'b'),
+    DistributionType.GAMMA: ('shape', 'scale'),
+}
+
+# Accepted alternative parameter names
+_PARAM_ALIASES = {'low': 'min', 'high': 'max'}
+
+# Valid parameter ranges: (check on the positional params, description). Checked
+# once per Variable so the inverse-CDF (QMC) path rejects exactly what the
+# pseudo-random samplers reject, instead of returning NaN or wrong samples.
+# Comparisons are written so that NaN parameters fail them too
+_PARAM_CONSTRAINTS: Dict[DistributionType, Tuple[Callable[..., bool], str]] = {
+    DistributionType.NORMAL: (lambda mean, std: std >= 0, "std must be non-negative"),
+    DistributionType.LOGNORMAL: (lambda mean, sigma: sigma >= 0, "sigma must be non-negative"),
+    # Reversed bounds are accepted as before: every uniform path samples between them
+    DistributionType.UNIFORM: (
+        lambda low, high: math.isfinite(low) and math.isfinite(high),
+        "low and high must be finite"
+    ),
+    DistributionType.TRIANGULAR: (
+        lambda left, mode, right: left <= mode <= right and left < right,
+        "requires left <= mode <= right with left < right"
+    ),
+    DistributionType.EXPONENTIAL: (lambda scale: scale >= 0, "scale must be non-negative"),
+    DistributionType.BETA: (lambda a, b: a > 0 and b > 0, "a and b must be positive"),
+    DistributionType.GAMMA: (
+        lambda shape, scale: shape > 0 and scale >= 0,
+        "shape must be positive and scale non-negative"
+    ),
+}
+
+# Pseudo-random samplers: (rng, size, *params) -> samples
+_SAMPLERS: Dict[DistributionType, Callable[..., np.ndarray]] = {
+    DistributionType.NORMAL: lambda rng, size, mean, std: rng.normal(mean, std, size),
+    DistributionType.LOGNORMAL: lambda rng, size, mean, sigma: rng.lognormal(mean, sigma, size),
+    # Same stream as rng.uniform, which rejects reversed bounds
+    DistributionType.UNIFORM: lambda rng, size, low, high: low + (high - low) * rng.random(size),
+    DistributionType.TRIANGULAR: lambda rng, size, left, mode, right: rng.triangular(left, mode, right, size),
+    DistributionType.EXPONENTIAL: lambda rng, size, scale: rng.exponential(scale, size),
+    DistributionType.BETA: lambda rng, size, a, b: rng.beta(a, b, size),
+    DistributionType.GAMMA: lambda rng, size, shape, scale: rng.gamma(shape, scale, size),
+}
+
+# Samplers that draw natively in single precision: (rng, size, *params) -> float32 samples
+_FLOAT32_SAMPLERS: Dict[DistributionType, Callable[..., np.ndarray]] = {
+    DistributionType.NORMAL: lambda rng, size, mean, std: mean + std * rng.standard_normal(size, dtype=np.float32),
+    DistributionType.UNIFORM: lambda rng, size, low, high: low + (high - low) * rng.random(size, dtype=np.float32),
+    DistributionType.EXPONENTIAL: lambda rng, size, scale: scale * rng.standard_exponential(size, dtype=np.float32),
+}
+
+# Floating precisions accepted by run_simulation
+_PRECISIONS = ('float32', 'float64')
+
+# Executors for n_jobs > 1: threads share memory, 'loky' (joblib) uses worker processes
+_BACKENDS = ('threads', 'loky')
+
+# Inverse CDFs: (u, *params) -> samples. Location-scale families are written
+# out so degenerate (zero-width) params stay finite
+_PPFS: Dict[DistributionType, Callable[..., np.ndarray]] = {
+    DistributionType.NORMAL: lambda u, mean, std: mean + std * ndtri(u),
+    DistributionType.LOGNORMAL: lambda u, mean, sigma: np.exp(mean + sigma * ndtri(u)),
+    DistributionType.UNIFORM: lambda u, low, high: low + (high - low) * u,
+    DistributionType.TRIANGULAR: lambda u, left, mode, right: stats.triang.ppf(
+        u, c=(mode - left) / (right - left), loc=left, scale=right - left
+    ),
+    DistributionType.EXPONENTIAL: lambda u, scale: stats.expon.ppf(u, scale=scale),
+    DistributionType.BETA: lambda u, a, b: stats.beta.ppf(u, a, b),
+    DistributionType.GAMMA: lambda u, shape, scale: stats.gamma.ppf(u, shape, scale=scale),
+}
+
+# Families that are transforms of a normal skip the CDF/inverse-CDF round trip
+_FROM_STANDARD_NORMAL: Dict[DistributionType, Callable[..., np.ndarray]] = {
+    DistributionType.NORMAL: lambda z, mean, std: mean + std * z,
+    DistributionType.LOGNORMAL: lambda z, mean, sigma: np.exp(mean + sigma * z),
+}
+
+
+def _resolve_ppf(distribution: DistributionType) -> Optional[Callable[..., np.ndarray]]:
+    """Compiled multi-threaded inverse CDF when Numba provides one, else the NumPy/SciPy version"""
+    if isinstance(distribution, DistributionType):
+        compiled = ppf_ufunc(distribution.value)
+        if compiled is not None:
+            return compiled
+    return _PPFS.get(distribution)
+
+
+def _lookup_param(params: Dict[str, float], key: str) -> float:
+    """Look up a distribution parameter, accepting its alias"""
+    if key in params or key not in _PARAM_ALIASES:
+        return params[key]
+    return params[_PARAM_ALIASES[key]]
+
+
+def _as_generator(
+    random_state: Optional[Union[int, np.random.Generator, np.random.RandomState]] = None
+) -> np.random.Generator:
+    """
+    Coerce a seed, Generator or legacy RandomState into a PCG64-backed Generator
+
+    A RandomState is not used for drawing (MT19937 is the slower bit generator);
+    it seeds a fresh PCG64 instead, so a seeded RandomState stays reproducible.
+    """
+    if isinstance(random_state, np.random.RandomState):
+        return np.random.default_rng(random_state.randint(0, 2**32, size=4, dtype=np.uint32))
+    return np.random.default_rng(random_state)
+
+
+@lru_cache(maxsize=32)
+def _cholesky_cached(matrix_bytes: bytes, shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Lower Cholesky factor of a correlation matrix, cached by its raw float64 bytes
+
+    Module-level, so repeated tool calls with the same scenario template reuse
+    the factorization across engine instances.
+    """
+    L = np.linalg.cholesky(np.frombuffer(matrix_bytes, dtype=np.float64).reshape(shape))
+    L.flags.writeable = False  # Shared between calls
+    return L
+
+
 @dataclass
 class Variable:
     """Represents a simulation variable with its distribution"""
@@ -32,180 +185,630 @@ class Variable:
     distribution: DistributionType
     params: Dict[str, float]
 
-    def sample(self, size: int, random_state: Optional[np.random.RandomState] = None) -> np.ndarray:
-        """Generate random samples from the variable's distribution"""
-        rng = random_state if random_state is not None else np.random
-
-        if self.distribution == DistributionType.NORMAL:
-            return rng.normal(self.params['mean'], self.params['std'], size)
+    def __post_init__(self):
+        # Unsupported distributions are reported when sampled
+        constraint = _PARAM_CONSTRAINTS.get(self.distribution)
+        if constraint is not None:
+            check, description = constraint
+            if not check(*self._args):
+                raise ValueError(
+                    f"Invalid {self.distribution.value} parameters for '{self.name}': "
+                    f"{description}, got {self.params}"
+                )
 
-        elif self.distribution == DistributionType.LOGNORMAL:
-            return rng.lognormal(self.params['mean'], self.params['sigma'], size)
+    # Samplers, transforms and parameters are looked up per call rather than stored,
+    # so variables stay picklable and later edits to params are honoured
 
-        elif self.distribution == DistributionType.UNIFORM:
-            low = self.params.get('low', self.params.get('min'))
-            high = self.params.get('high', self.params.get('max'))
-            return rng.uniform(low, high, size)
+    @property
+    def _args(self) -> Tuple[float, ...]:
+        """Distribution parameters in sampler order"""
+        keys = _PARAM_KEYS.get(self.distribution)
+        return tuple(_lookup_param(self.params, key) for key in keys) if keys else ()
 
-        elif self.distribution == DistributionType.TRIANGULAR:
-            return rng.triangular(
-                self.params['left'],
-                self.params['mode'],
-                self.params['right'],
-                size
-            )
+    @property
+    def _sampler(self) -> Optional[Callable[..., np.ndarray]]:
+        return _SAMPLERS.get(self.distribution)
 
-        elif self.distribution == DistributionType.EXPONENTIAL:
-            return rng.exponential(self.params['scale'], size)
+    @property
+    def _from_normal(self) -> Optional[Callable[..., np.ndarray]]:
+        return _FROM_STANDARD_NORMAL.get(self.distribution)
 
-        elif self.distribution == DistributionType.BETA:
-            return rng.beta(self.params['a'], self.params['b'], size)
+    @property
+    def _ppf(self) -> Optional[Callable[..., np.ndarray]]:
+        """Inverse CDF, resolved on use: the Numba ufunc compiles only if a run needs it"""
+        return _resolve_ppf(self.distribution)
 
-        elif self.distribution == DistributionType.GAMMA:
-            return rng.gamma(self.params['shape'], self.params['scale'], size)
+    def sample(
+        self,
+        size: int,
+        random_state: Optional[Union[np.random.Generator, np.random.RandomState]] = None,
+        u: Optional[np.ndarray] = None,
+        dtype: Optional[np.dtype] = None
+    ) -> np.ndarray:
+        """
+        Generate random samples from the variable's distribution
 
+        Args:
+            size: Number of samples to draw
+            random_state: Optional generator for pseudo-random sampling
+                (a legacy RandomState only seeds a PCG64 Generator)
+            u: Optional uniform points in [0, 1); when given, samples are the
+               inverse CDF of these points (quasi-Monte Carlo path)
+            dtype: Optional floating dtype of the returned samples (default float64)
+        """
+        if u is not None:
+            samples = self.ppf(u[:size])
+        elif self._sampler is None:
+            raise ValueError(f"Unsupported distribution: {self.distribution}")
         else:
+            rng = _as_generator(random_state)
+            samples = self._sampler(rng, size, *self._args)
+
+        return samples.astype(dtype, copy=False) if dtype is not None else samples
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        """Inverse CDF of the variable's distribution evaluated at uniform points u"""
+        if self._ppf is None:
             raise ValueError(f"Unsupported distribution: {self.distribution}")
 
+        return self._ppf(u, *self._args)
+
+    def from_standard_normal(self, z: np.ndarray) -> np.ndarray:
+        """Map standard normal values to this distribution (Gaussian copula transform)"""
+        if self._from_normal is not None:
+            return self._from_normal(z, *self._args)
+
+        # ndtr is the raw standard normal CDF ufunc, without rv_continuous overhead
+        return self.ppf(ndtr(z))
+
+
+class SampleView(Mapping):
+    """
+    Read-only name -> samples mapping over a (simulations x variables) matrix
+
+    Indexing by name returns a column view (no copy); the matrix itself is
+    exposed as .matrix for whole-sample operations such as sensitivity.
+    """
+    __slots__ = ('matrix', 'names', '_columns')
+
+    def __init__(self, matrix: np.ndarray, names: List[str]):
+        self.matrix = matrix
+        self.names = list(names)
+        self._columns = {name: j for j, name in enumerate(self.names)}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.matrix[:, self._columns[name]]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return f"SampleView(names={self.names}, shape={self.matrix.shape})"
+
 
 class MonteCarloEngine:
     """High-performance Monte Carlo simulation engine"""
 
-    def __init__(self, random_seed: Optional[int] = None):
+    def __init__(
+        self,
+        random_seed: Optional[Union[int, np.random.Generator, np.random.RandomState]] = None,
+        qmc: bool = True,
+        dtype: np.dtype = np.float64
+    ):
         """
         Initialize Monte Carlo engine
 
         Args:
-            random_seed: Seed for reproducibility (None for non-deterministic)
+            random_seed: Seed for reproducibility (None for non-deterministic),
+                 an existing Generator to draw from directly, or a legacy
+                 RandomState used only to seed a PCG64 Generator
+            qmc: Use scrambled Sobol' low-discrepancy points instead of
+                 pseudo-random draws (faster convergence for the same N)
+            dtype: Floating dtype used to store samples; float32 halves memory
+                 and bandwidth when that precision is enough for the outputs
         """
-        self.random_state = np.random.RandomState(random_seed) if random_seed is not None else None
+        self.random_state = _as_generator(random_seed)
+        self.qmc = qmc
+        self.dtype = np.dtype(dtype)
+
+    def spawn(self, n: int) -> List[np.random.Generator]:
+        """Create n independent child generators (e.g. one per parallel chunk)"""
+        return self.random_state.spawn(n)
 
     def run_simulation(
         self,
         variables: List[Variable],
         outcome_function: Callable,
         num_simulations: int = 10000,
-        correlation_matrix: Optional[np.ndarray] = None
+        correlation_matrix: Optional[np.ndarray] = None,
+        n_jobs: int = 1,
+        return_samples: bool = True,
+        return_outcomes: bool = True,
+        compute_sensitivity: bool = False,
+        chunk_size: Optional[int] = None,
+        vectorized: Optional[bool] = None,
+        precision: Optional[str] = None,
+        backend: str = 'threads'
     ) -> Dict[str, Any]:
         """
         Run Monte Carlo simulation
 
         Args:
             variables: List of Variable objects defining uncertainty
-            outcome_function: Function that takes dict of variable values and returns outcome
+            outcome_function: Function that takes dict of variable sample arrays and
+                returns an array of outcomes (scalar functions are evaluated per simulation)
             num_simulations: Number of Monte Carlo iterations
             correlation_matrix: Optional correlation matrix for multivariate sampling
+            n_jobs: Number of threads evaluating outcome_function over chunks of
+                simulations (-1 for all cores); results do not depend on n_jobs
+            return_samples: Include the per-variable 'samples' in the results, as a
+                SampleView mapping names to columns of one (simulations x variables) matrix
+            return_outcomes: Include the raw 'outcomes' array in the results
+            compute_sensitivity: Add a 'sensitivity' entry computed before the
+                samples are released, so callers can skip return_samples
+            chunk_size: Opt-in streaming. When set, samples are not returned and
+                num_simulations exceeds it, simulate in chunks of this size (rounded
+                down to a power of two under QMC) so the full sample matrix is never
+                held. Draws then come from a different stream than an unchunked run;
+                moments stay exact, but sensitivity is computed on a uniform subsample
+                of chunk_size rows ('sensitivity_method': 'subsample'). Percentiles are
+                exact when outcomes are returned, else they also come from the
+                subsample (constant memory)
+            vectorized: True calls outcome_function exactly once on the whole
+                sample arrays (errors propagate), False calls it per simulation
+                with scalars, None tries the array call and falls back per simulation.
+                The fallback only catches NumPy's array-to-scalar errors (other
+                errors propagate), but a scalar-only function is then called
+                num_simulations + 1 times; pass True or False for functions with
+                side effects
+            precision: 'float32' or 'float64' storage for this run's samples (and
+                vectorized outcomes), overriding the engine dtype; statistics and
+                percentiles are always returned as Python floats
+            backend: Executor for n_jobs > 1: 'threads', or 'loky' worker processes
+                (requires joblib) for scalar Python outcome functions that hold the GIL;
+                samples are drawn before the split, so results do not depend on it
 
         Returns:
             Dictionary with simulation results and statistics
         """
 
+        if num_simulations <= 0:
+            raise ValueError(f"num_simulations must be positive, got {num_simulations}")
+
+        if n_jobs == 0 or n_jobs < -1:
+            raise ValueError(f"n_jobs must be positive or -1, got {n_jobs}")
+
+        if chunk_size is not None and chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+        if precision is not None and precision not in _PRECISIONS:
+            raise ValueError(f"precision must be one of {_PRECISIONS}, got {precision!r}")
+        dtype = np.dtype(precision) if precision is not None else self.dtype
+
+        if backend not in _BACKENDS:
+            raise ValueError(f"backend must be one of {_BACKENDS}, got {backend!r}")
+        if backend == 'loky' and not JOBLIB_AVAILABLE:
+            raise ImportError("backend='loky' requires joblib (pip install joblib)")
+
+        if chunk_size is not None and not return_samples and num_simulations > chunk_size:
+            return self._run_streaming(
+                variables, outcome_function, num_simulations, correlation_matrix,
+                n_jobs, chunk_size, compute_sensitivity, vectorized, dtype, backend,
+                return_outcomes
+            )
+
         # Generate samples for all variables
-        samples = {}
-        for var in variables:
-            samples[var.name] = var.sample(num_simulations, self.random_state)
+        uniform = self._sobol_points(len(variables), num_simulations) if self.qmc and variables else None
+        sample_matrix = self._draw_samples(variables, num_simulations, correlation_matrix, uniform, dtype)
 
-        # Apply correlation if specified
-        if correlation_matrix is not None:
-            samples = self._apply_correlation(samples, correlation_matrix, variables)
+        # Name-keyed views into the matrix columns (no copies)
+        samples = SampleView(sample_matrix, [var.name for var in variables])
 
         # Calculate outcomes
-        outcomes = np.array([
-            outcome_function({name: samples[name][i] for name in samples})
-            for i in range(num_simulations)
-        ])
+        outcomes = self._compute_outcomes(
+            outcome_function, samples, num_simulations, n_jobs, vectorized, backend
+        )
+        self._check_finite(outcomes)
 
-        # Calculate statistics
+        # Calculate statistics; the median is the P50 of the same percentile partition
+        percentiles = self._calculate_percentiles(outcomes)
         results = {
-            'outcomes': outcomes,
-            'statistics': self._calculate_statistics(outcomes),
-            'percentiles': self._calculate_percentiles(outcomes),
-            'samples': samples,
+            'statistics': self._calculate_statistics(outcomes, median=percentiles['P50']),
+            'percentiles': percentiles,
             'num_simulations': num_simulations
         }
 
+        if compute_sensitivity:
+            # Straight from the sample matrix, without restacking the named columns
+            results['sensitivity'] = self._rank_sensitivity(
+                [var.name for var in variables], sample_matrix, outcomes
+            )
+            results['sensitivity_method'] = 'exact'
+
+        # Large arrays are only kept alive when the caller asks for them
+        if return_outcomes:
+            results['outcomes'] = outcomes
+        if return_samples:
+            results['samples'] = samples
+
         return results
 
-    def _apply_correlation(
+    def _run_streaming(
         self,
-        samples: Dict[str, np.ndarray],
-        corr_matrix: np.ndarray,
-        variables: List[Variable]
-    ) -> Dict[str, np.ndarray]:
-        """Apply correlation structure to samples using Cholesky decomposition"""
+        variables: List[Variable],
+        outcome_function: Callable,
+        num_simulations: int,
+        correlation_matrix: Optional[np.ndarray],
+        n_jobs: int,
+        chunk_size: int,
+        compute_sensitivity: bool,
+        vectorized: Optional[bool],
+        dtype: np.dtype,
+        backend: str,
+        return_outcomes: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Simulate chunk by chunk, keeping running moments and a bounded subsample
 
-        # Validate correlation matrix
-        if not np.allclose(corr_matrix, corr_matrix.T, atol=1e-8):
-            raise ValueError("Correlation matrix must be symmetric")
+        With return_outcomes the chunk outcomes are also written into one
+        preallocated array (N values, never the N x k samples).
+        """
+        sampler = None
+        if self.qmc and variables:
+            sampler = qmc.Sobol(d=len(variables), scramble=True, rng=self.random_state)
+            # Sobol' balance properties need power-of-two blocks
+            chunk_size = 2 ** int(math.log2(chunk_size))
+
+        running_moments = None
+        all_outcomes = None
+        # The subsample feeds the percentiles (unless all outcomes are kept) and sensitivity
+        subsample = compute_sensitivity or not return_outcomes
+        kept_keys = np.empty(0)
+        kept_outcomes = np.empty(0)
+        kept_samples = np.empty((0, len(variables)), dtype=dtype)
+
+        for start in range(0, num_simulations, chunk_size):
+            size = min(chunk_size, num_simulations - start)
+            uniform = sampler.random(chunk_size)[:size] if sampler is not None else None
+            sample_matrix = self._draw_samples(variables, size, correlation_matrix, uniform, dtype)
+            samples = SampleView(sample_matrix, [var.name for var in variables])
+            outcomes = self._compute_outcomes(outcome_function, samples, size, n_jobs, vectorized, backend)
+            self._check_finite(outcomes)
+
+            chunk_moments = moments(outcomes)
+            running_moments = chunk_moments if running_moments is None else merge_moments(running_moments, chunk_moments)
+
+            if return_outcomes:
+                if all_outcomes is None:
+                    all_outcomes = np.empty(num_simulations, dtype=outcomes.dtype)
+                all_outcomes[start:start + size] = outcomes
+
+            if not subsample:
+                continue
+
+            # Uniform subsample without replacement: keep the rows with the smallest random keys
+            keys = np.concatenate([kept_keys, self.random_state.random(size)])
+            candidate_outcomes = np.concatenate([kept_outcomes, outcomes])
+            candidate_samples = np.concatenate([kept_samples, sample_matrix])
+            keep = np.argpartition(keys, chunk_size)[:chunk_size] if len(keys) > chunk_size else slice(None)
+            kept_keys, kept_outcomes, kept_samples = keys[keep], candidate_outcomes[keep], candidate_samples[keep]
+
+        percentiles = self._calculate_percentiles(all_outcomes if return_outcomes else kept_outcomes)
+        results = {
+            'statistics': self._statistics_from_moments(running_moments, percentiles['P50']),
+            'percentiles': percentiles,
+            'num_simulations': num_simulations
+        }
+        if return_outcomes:
+            results['outcomes'] = all_outcomes
+        else:
+            results['percentile_sample_size'] = len(kept_outcomes)
 
-        # Check positive definite (all eigenvalues > 0)
-        eigvals = np.linalg.eigvals(corr_matrix)
-        if not np.all(eigvals > -1e-10):  # Allow small numerical errors
-            raise ValueError("Correlation matrix must be positive definite")
+        if compute_sensitivity:
+            results['sensitivity'] = self._rank_sensitivity(
+                [var.name for var in variables], kept_samples, kept_outcomes
+            )
+            results['sensitivity_method'] = 'subsample'
 
-        # Convert samples to matrix (variables x simulations)
-        var_names = [v.name for v in variables]
-        sample_matrix = np.array([samples[name] for name in var_names])
+        return results
 
-        # Transform to standard normal
-        uniform = stats.norm.cdf(sample_matrix)
-        standard_normal = stats.norm.ppf(uniform)
+    def _draw_samples(
+        self,
+        variables: List[Variable],
+        num_simulations: int,
+        correlation_matrix: Optional[np.ndarray],
+        uniform: Optional[np.ndarray],
+        dtype: Optional[np.dtype] = None
+    ) -> np.ndarray:
+        """Draw a (simulations x variables) sample matrix of the given dtype (default: the engine's)"""
+        # One contiguous column per variable (Fortran order keeps each column contiguous)
+        if dtype is None:
+            dtype = self.dtype
+        sample_matrix = np.empty((num_simulations, len(variables)), dtype=dtype, order='F')
 
-        # Apply Cholesky decomposition
-        try:
-            L = np.linalg.cholesky(corr_matrix)
-            correlated_normal = L @ standard_normal
-        except np.linalg.LinAlgError as e:
-            raise ValueError(f"Correlation matrix Cholesky decomposition failed: {e}")
+        if correlation_matrix is not None:
+            self._apply_correlation(sample_matrix, np.asarray(correlation_matrix), variables, uniform)
+        else:
+            self._sample_all(variables, num_simulations, uniform, out=sample_matrix)
 
-        # Transform back to uniform then to original distributions
-        correlated_uniform = stats.norm.cdf(correlated_normal)
+        return sample_matrix
 
-        # Transform back to original distributions
-        correlated_samples = {}
-        for i, var in enumerate(variables):
-            # Get inverse CDF (PPF) of the variable's distribution
-            if var.distribution == DistributionType.NORMAL:
-                correlated_samples[var.name] = stats.norm.ppf(
-                    correlated_uniform[i],
-                    loc=var.params['mean'],
-                    scale=var.params['std']
-                )
-            elif var.distribution == DistributionType.UNIFORM:
-                low = var.params.get('low', var.params.get('min'))
-                high = var.params.get('high', var.params.get('max'))
-                correlated_samples[var.name] = stats.uniform.ppf(
-                    correlated_uniform[i],
-                    loc=low,
-                    scale=high - low
+    def _sample_all(
+        self,
+        variables: List[Variable],
+        num_simulations: int,
+        uniform: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Draw independent samples for all variables with one call per distribution family
+
+        Variables sharing a family are drawn together as a (simulations x k) block,
+        with their parameters broadcast as length-k arrays, instead of one sampler
+        call per variable. With uniform points the family's inverse CDF is applied
+        to the matching columns instead. A float32 output draws natively in single
+        precision where the generator supports it.
+        """
+        if out is None:
+            out = np.empty((num_simulations, len(variables)), dtype=self.dtype, order='F')
+
+        families: Dict[Any, List[int]] = {}
+        for j, var in enumerate(variables):
+            families.setdefault(var.distribution, []).append(j)
+
+        for distribution, columns in families.items():
+            first = variables[columns[0]]
+            params = [np.array(values) for values in zip(*(variables[j]._args for j in columns))]
+
+            transform = first._ppf if uniform is not None else first._sampler
+            if transform is None:
+                raise ValueError(f"Unsupported distribution: {distribution}")
+
+            single = _FLOAT32_SAMPLERS.get(distribution) if out.dtype == np.float32 else None
+
+            if uniform is not None:
+                draws = transform(uniform[:, columns], *params)
+            elif single is not None:
+                # float32 params keep the arithmetic from promoting back to float64
+                draws = single(self.random_state, (num_simulations, len(columns)),
+                               *(p.astype(np.float32) for p in params))
+            else:
+                draws = transform(self.random_state, (num_simulations, len(columns)), *params)
+
+            # Assignment casts to the matrix dtype
+            out[:, columns] = draws
+
+        return out
+
+    @staticmethod
+    def _check_finite(outcomes: np.ndarray) -> None:
+        """Warn when single-precision outcomes overflowed to inf/nan"""
+        if outcomes.dtype == np.float32 and not np.isfinite(outcomes).all():
+            warnings.warn(
+                "outcome_function produced non-finite values in float32; "
+                "rerun with precision='float64' if they come from overflow",
+                RuntimeWarning,
+                stacklevel=3
+            )
+
+    def _compute_outcomes(
+        self,
+        outcome_function: Callable,
+        samples: Mapping[str, np.ndarray],
+        num_simulations: int,
+        n_jobs: int,
+        vectorized: Optional[bool] = None,
+        backend: str = 'threads'
+    ) -> np.ndarray:
+        """Evaluate outcomes serially or across n_jobs threads or processes"""
+        if n_jobs == 1:
+            return self._evaluate_outcomes(outcome_function, samples, num_simulations, vectorized)
+        return self._evaluate_outcomes_parallel(
+            outcome_function, samples, num_simulations, n_jobs, vectorized, backend
+        )
+
+    @staticmethod
+    def _evaluate_outcomes(
+        outcome_function: Callable,
+        samples: Mapping[str, np.ndarray],
+        num_simulations: int,
+        vectorized: Optional[bool] = None
+    ) -> np.ndarray:
+        """Evaluate outcome_function on whole sample arrays, falling back to per-simulation calls"""
+        if vectorized:
+            outcomes = MonteCarloEngine._evaluate_vectorized(outcome_function, samples)
+            if outcomes.shape != (num_simulations,):
+                raise ValueError(
+                    f"Vectorized outcome_function must return shape ({num_simulations},), got {outcomes.shape}"
                 )
+            return outcomes
+
+        if vectorized is None:
+            try:
+                outcomes = MonteCarloEngine._evaluate_vectorized(outcome_function, samples)
+            except (TypeError, ValueError) as exc:
+                if not _SCALAR_ONLY_ERROR.search(str(exc)):
+                    raise
+                logger.debug("outcome_function is scalar-only (%s); evaluating per simulation", exc)
             else:
-                # For other distributions, use the original samples (approximation)
-                correlated_samples[var.name] = samples[var.name]
+                if outcomes.shape == (num_simulations,):
+                    return outcomes
+                logger.debug(
+                    "outcome_function returned shape %s on arrays; evaluating per simulation",
+                    outcomes.shape
+                )
+
+        return np.array([
+            outcome_function({name: samples[name][i] for name in samples})
+            for i in range(num_simulations)
+        ], dtype=float)
+
+    @staticmethod
+    def _evaluate_vectorized(outcome_function: Callable, samples: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Single call of outcome_function on the whole sample arrays"""
+        # Floating outcomes keep their dtype (e.g. float32 samples stay float32)
+        outcomes = np.asarray(outcome_function(samples))
+        if not np.issubdtype(outcomes.dtype, np.floating):
+            outcomes = outcomes.astype(float)
+        return outcomes
+
+    def _evaluate_outcomes_parallel(
+        self,
+        outcome_function: Callable,
+        samples: Mapping[str, np.ndarray],
+        num_simulations: int,
+        n_jobs: int,
+        vectorized: Optional[bool] = None,
+        backend: str = 'threads'
+    ) -> np.ndarray:
+        """Evaluate outcome_function on row chunks of the samples in a thread or process pool"""
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        n_jobs = min(n_jobs, num_simulations)
+
+        bounds = np.linspace(0, num_simulations, n_jobs + 1).astype(int)
+
+        # Row chunks as name -> column-slice views, cut in this process
+        chunks = [
+            ({name: column[start:stop] for name, column in samples.items()}, stop - start)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+        if backend == 'loky':
+            # Processes sidestep the GIL for per-simulation Python calls. Each task
+            # gets only its chunk (a pickled slice holds just its own rows) and the
+            # static evaluator, never the engine or the full sample matrix
+            outcomes = Parallel(n_jobs=n_jobs, backend='loky')(
+                delayed(MonteCarloEngine._evaluate_outcomes)(outcome_function, chunk, size, vectorized)
+                for chunk, size in chunks
+            )
+            return np.concatenate(outcomes)
+
+        # NumPy releases the GIL inside vectorized kernels, so threads overlap;
+        # threads also share the sample views without any copying
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            outcomes = executor.map(
+                lambda task: self._evaluate_outcomes(outcome_function, *task, vectorized), chunks
+            )
+            return np.concatenate(list(outcomes))
+
+    def _sobol_points(self, dimensions: int, num_simulations: int) -> np.ndarray:
+        """Draw scrambled Sobol' points in [0, 1)^d, rounded up to a power of two"""
+        sampler = qmc.Sobol(d=dimensions, scramble=True, rng=self.random_state)
+        points = sampler.random_base2(m=math.ceil(math.log2(num_simulations)))
+        return points[:num_simulations]
+
+    def _apply_correlation(
+        self,
+        sample_matrix: np.ndarray,
+        corr_matrix: np.ndarray,
+        variables: List[Variable],
+        uniform: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Fill the (simulations x variables) sample matrix with correlated samples
+        using a Gaussian copula: correlate standard normals with the Cholesky
+        factor, then map each row through its variable's inverse CDF once
+        """
+
+        # Validate correlation matrix
+        num_variables = len(variables)
+        if corr_matrix.shape != (num_variables, num_variables):
+            raise ValueError(
+                f"Correlation matrix must be {num_variables}x{num_variables}, got {corr_matrix.shape}"
+            )
+
+        if not np.allclose(corr_matrix, corr_matrix.T, atol=1e-8):
+            raise ValueError("Correlation matrix must be symmetric")
 
-        return correlated_samples
+        # Cholesky only reads the lower triangle, so average out any tolerated asymmetry.
+        # It also fails fast on matrices that are not positive definite (no separate
+        # eigenvalue check); the factor is cached since workflows rerun the same matrix
+        corr_matrix = np.ascontiguousarray((corr_matrix + corr_matrix.T) / 2, dtype=np.float64)
+        try:
+            L = _cholesky_cached(corr_matrix.tobytes(), corr_matrix.shape)
+        except np.linalg.LinAlgError as e:
+            raise ValueError(f"Correlation matrix must be positive definite: {e}")
+
+        # Independent standard normals (simulations x variables), filled in place into a
+        # Fortran-ordered buffer so BLAS reads it without a transpose copy and each
+        # variable's column is contiguous
+        num_simulations = sample_matrix.shape[0]
+        standard_normal = np.empty((num_simulations, num_variables), dtype=np.float64, order='F')
+        if uniform is not None:
+            ndtri(uniform, out=standard_normal)
+        else:
+            self.random_state.standard_normal(out=standard_normal)
+
+        if all(var.distribution == DistributionType.NORMAL for var in variables):
+            # All-normal fast path: the draw is multivariate normal, so fold each
+            # variable's std into its row of the (still lower-triangular) factor and
+            # finish with one broadcast add of the means instead of per-column transforms
+            means, stds = np.array([var._args for var in variables], dtype=np.float64).T
+            correlated_normal = dtrmm(1.0, stds[:, None] * L, standard_normal,
+                                      side=1, lower=1, trans_a=1, overwrite_b=1)
+            np.add(correlated_normal, means, out=sample_matrix, casting='same_kind')
+            return
+
+        # Z @ L.T as an in-place triangular product (BLAS trmm: half the flops of a general matmul)
+        correlated_normal = dtrmm(1.0, L, standard_normal, side=1, lower=1, trans_a=1, overwrite_b=1)
+
+        # Transform to each variable's distribution, writing columns in place
+        # (the factor and normals stay float64; assignment casts to the matrix dtype)
+        for i, var in enumerate(variables):
+            sample_matrix[:, i] = var.from_standard_normal(correlated_normal[:, i])
+
+    def _calculate_statistics(self, outcomes: np.ndarray, median: Optional[float] = None) -> Dict[str, float]:
+        """Calculate statistical measures of outcomes (pass an already known median to skip its selection)"""
+        if median is None:
+            median = float(np.median(outcomes))
+        return self._statistics_from_moments(moments(outcomes), median)
+
+    def _statistics_from_moments(self, outcome_moments: Tuple[float, ...], median: float) -> Dict[str, float]:
+        """Statistical measures from moments() sums"""
+        # Skew/kurtosis are the biased (population) estimators, matching scipy.stats defaults
+        n, mean, m2, m3, m4, lo, hi = outcome_moments
+        variance = m2 / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skewness = np.divide(np.sqrt(n) * m3, m2 ** 1.5)
+            kurtosis = np.divide(n * m4, m2 ** 2) - 3.0
 
-    def _calculate_statistics(self, outcomes: np.ndarray) -> Dict[str, float]:
-        """Calculate statistical measures of outcomes"""
         return {
-            'mean': float(np.mean(outcomes)),
-            'median': float(np.median(outcomes)),
-            'std': float(np.std(outcomes)),
-            'variance': float(np.var(outcomes)),
-            'min': float(np.min(outcomes)),
-            'max': float(np.max(outcomes)),
-            'skewness': float(stats.skew(outcomes)),
-            'kurtosis': float(stats.kurtosis(outcomes))
+            'mean': float(mean),
+            'median': float(median),
+            'std': float(np.sqrt(variance)),
+            'variance': float(variance),
+            'min': float(lo),
+            'max': float(hi),
+            'skewness': float(skewness),
+            'kurtosis': float(kurtosis)
         }
 
     def _calculate_percentiles(self, outcomes: np.ndarray) -> Dict[str, float]:
         """Calculate percentile values"""
         percentiles = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+        values = self._partition_percentiles(outcomes, percentiles)
         return {
-            f'P{p}': float(np.percentile(outcomes, p))
-            for p in percentiles
+            f'P{p}': float(v)
+            for p, v in zip(percentiles, values)
         }
 
+    @staticmethod
+    def _partition_percentiles(outcomes: np.ndarray, percentiles: List[float]) -> np.ndarray:
+        """
+        Linearly interpolated percentiles (same as np.percentile) from a single
+        introselect partition on all the order statistics they need
+        """
+        n = len(outcomes)
+        positions = np.asarray(percentiles, dtype=float) / 100 * (n - 1)
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.minimum(lower + 1, n - 1)
+        partitioned = np.partition(outcomes, np.union1d(lower, upper))
+        return partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (positions - lower)
+
     def calculate_confidence_interval(
         self,
         outcomes: np.ndarray,
@@ -213,27 +816,58 @@ class MonteCarloEngine:
     ) -> Tuple[float, float]:
         """Calculate confidence interval for outcomes"""
         alpha = 1 - confidence_level
-        lower = np.percentile(outcomes, alpha/2 * 100)
-        upper = np.percentile(outcomes, (1 - alpha/2) * 100)
+        lower, upper = self._partition_percentiles(
+            outcomes, [alpha/2 * 100, (1 - alpha/2) * 100]
+        )
         return (float(lower), float(upper))
 
     def sensitivity_analysis(
         self,
-        variables: List[Variable],
-        outcome_function: Callable,
         outcomes: np.ndarray,
-        samples: Dict[str, np.ndarray]
+        samples: Mapping[str, np.ndarray]
     ) -> Dict[str, float]:
         """
         Calculate sensitivity of outcome to each input variable
-        Uses Spearman rank correlation
+        Uses Spearman rank correlation of the already simulated samples and
+        outcomes, so the outcome function is never evaluated again
         """
-        sensitivity = {}
+        if not samples:
+            return {}
+
+        names = list(samples)
+        if isinstance(samples, SampleView):
+            sample_matrix = samples.matrix
+        else:
+            sample_matrix = np.column_stack([samples[name] for name in names])
+
+        return self._rank_sensitivity(names, sample_matrix, outcomes)
+
+    @staticmethod
+    def _rank_sensitivity(
+        names: List[str],
+        sample_matrix: np.ndarray,
+        outcomes: np.ndarray
+    ) -> Dict[str, float]:
+        """Spearman R-squared of each sample matrix column against the outcomes"""
+        if not names:
+            return {}
+
+        # Spearman = Pearson on ranks: rank every column and the outcomes once,
+        # then correlate all variables against the outcome ranks in one product
+        ranked_samples = stats.rankdata(sample_matrix, axis=0)
+        ranked_outcomes = stats.rankdata(outcomes)
+        ranked_samples -= ranked_samples.mean(axis=0)
+        ranked_outcomes -= ranked_outcomes.mean()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations = (ranked_outcomes @ ranked_samples) / (
+                np.linalg.norm(ranked_samples, axis=0) * np.linalg.norm(ranked_outcomes)
+            )
 
-        for var in variables:
-            # Calculate Spearman correlation between variable and outcome
-            correlation, _ = stats.spearmanr(samples[var.name], outcomes)
-            sensitivity[var.name] = float(correlation ** 2)  # R-squared
+        sensitivity = {
+            name: float(correlation ** 2)  # R-squared
+            for name, correlation in zip(names, correlations)
+        }
 
         # Sort by influence
         sensitivity = dict(sorted(sensitivity.items(), key=lambda x: abs(x[1]), reverse=True))
@@ -247,3 +881,28 @@ def create_variable_from_dict(var_dict: Dict[str, Any]) -> Variable:
         distribution=DistributionType(var_dict['distribution']),
         params=var_dict['params']
     )
+
+
+def sum_of_variables(values: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    Outcome function adding up every variable
+
+    On a SampleView this is one row reduction over the sample matrix instead of
+    k - 1 whole-array additions (each with its own temporary); plain mappings,
+    including per-simulation scalars, fall back to the built-in sum.
+    """
+    if isinstance(values, SampleView):
+        return values.matrix.sum(axis=1)
+    return sum(values.values())
+
+
+def product_of_variables(values: Mapping[str, np.ndarray], names: List[str]) -> np.ndarray:
+    """
+    Outcome function multiplying the named variables (e.g. market size x conversion x price)
+
+    On a SampleView this is one row reduction over the selected matrix columns;
+    plain mappings, including per-simulation scalars, fall back to math.prod.
+    """
+    if isinstance(values, SampleView):
+        return values.matrix[:, [values._columns[name] for name in names]].prod(axis=1)
+    return math.prod(values[name] for name in names)
@@ -0,0 +1,79 @@
+"""
+Shared pytest fixtures
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import pytest
+from tools.business_scenarios import run_business_scenario
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--worker-seed-offset",
+        type=int,
+        default=0,
+        help="shift every test seed by this offset times the pytest-xdist worker "
+             "index; seeds then depend on which worker runs a test (default 0: "
+             "seeds depend only on the test name)"
+    )
+
+
+def _seed_for(name: str) -> int:
+    """Stable 32-bit seed for a name (MD5, so unaffected by PYTHONHASHSEED)"""
+    return int.from_bytes(hashlib.md5(name.encode()).digest()[:4], "big")
+
+
+def _worker_index() -> int:
+    """pytest-xdist worker number (gw0, gw1, ...); 0 when not running under xdist"""
+    return int(os.environ.get("PYTEST_XDIST_WORKER", "gw0")[2:])
+
+
+@pytest.fixture(scope="session")
+def seed_for(pytestconfig):
+    """Seed derivation for tests that deliberately share a named stream"""
+    shift = pytestconfig.getoption("worker_seed_offset") * _worker_index()
+
+    def derive(name: str) -> int:
+        return (_seed_for(name) + shift) % 2**32
+
+    return derive
+
+
+@pytest.fixture
+def seed(request, seed_for):
+    """Seed unique to the requesting test, so no two tests share an RNG stream"""
+    return seed_for(request.node.name)
+
+
+@pytest.fixture(scope="session")
+def business_scenario_runner():
+    """
+    Run each distinct business scenario once per session
+
+    Keyword arguments are canonicalised to JSON (dicts are unhashable, and
+    read-only MappingProxyType inputs serialise as plain dicts) and the result
+    dict is shared between tests, which must treat it as read-only.
+    """
+    @lru_cache(maxsize=None)
+    def run_cached(params_json: str):
+        return run_business_scenario(**json.loads(params_json))
+
+    def run(**params):
+        return run_cached(json.dumps(params, sort_keys=True, default=dict))
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def result_digest():
+    """MD5 of a result dict's canonical JSON, minus the ignored (label) keys;
+    equal digests mean bitwise-equal numbers"""
+    def digest(result, ignore=()) -> str:
+        kept = {key: value for key, value in result.items() if key not in ignore}
+        return hashlib.md5(json.dumps(kept, sort_keys=True, default=float).encode()).hexdigest()
+
+    return digest
@@ -4,46 +4,85 @@ Unit tests for business scenario simulation tools
 
 import pytest
 import numpy as np
+import numpy.testing as npt
+from types import MappingProxyType
 from tools.business_scenarios import (
     run_business_scenario,
     run_sensitivity_analysis,
-    _interpret_scenario_results
+    _interpret_scenario_results,
+    _compounded_revenue_sum,
+    _seasonal_revenue_sum
 )
 
+# Full result contract of run_business_scenario, checked once in the schema test
+EXPECTED_KEYS = frozenset({
+    "scenario_name",
+    "time_horizon",
+    "expected_total_profit",
+    "probability_of_profitability",
+    "percentile_outcomes",
+    "risk_metrics",
+    "roi_analysis",
+    "statistics",
+    "num_simulations",
+    "sensitivity",
+    "interpretation"
+})
+
+# Shared read-only inputs; identical arguments also share a cached run
+DEFAULT_REVENUE = MappingProxyType({
+    "base_revenue": 100000,
+    "growth_rate": MappingProxyType({"mean": 0.05, "std": 0.02})
+})
+DEFAULT_COSTS = MappingProxyType({
+    "fixed_costs": 50000,
+    "variable_costs": MappingProxyType({"mean": 0.50, "std": 0.10})
+})
+
+
+@pytest.fixture
+def rng(seed):
+    """Fresh Generator per test, seeded from the test name"""
+    return np.random.default_rng(seed)
+
 
 class TestRunBusinessScenario:
     """Tests for run_business_scenario function"""
 
-    def test_basic_scenario(self):
+    def test_basic_scenario(self, business_scenario_runner, seed_for):
         """Test basic business scenario simulation"""
-        result = run_business_scenario(
+        result = business_scenario_runner(
             scenario_name="Basic Test Scenario",
-            revenue_assumptions={
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            cost_structure={
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed_for("Basic Test Scenario")
         )
 
-        assert 'scenario_name' in result
-        assert 'expected_total_profit' in result
-        assert 'probability_of_profitability' in result
-        assert 'percentile_outcomes' in result
-        assert 'risk_metrics' in result
-
         assert result['scenario_name'] == "Basic Test Scenario"
         assert result['time_horizon'] == 12
 
-    def test_profitability_calculation(self):
+    def test_run_business_scenario_schema(self, seed):
+        """Test the complete result schema on a tiny run"""
+        result = run_business_scenario(
+            scenario_name="Schema",
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
+            time_horizon=12,
+            num_simulations=50,
+            random_seed=seed
+        )
+
+        assert result.keys() == EXPECTED_KEYS
+        assert result['percentile_outcomes'].keys() == {"pessimistic_P10", "most_likely_P50", "optimistic_P90"}
+        assert result['risk_metrics'].keys() == {"downside_risk", "upside_potential", "outcome_range"}
+        assert result['statistics'].keys() >= {"mean", "std", "min", "max"}
+
+    def test_profitability_calculation(self, business_scenario_runner, seed):
         """Test profitability probability calculation"""
         # High profit scenario
-        result_high = run_business_scenario(
+        result_high = business_scenario_runner(
             scenario_name="High profit",
             revenue_assumptions={
                 "base_revenue": 200000,
@@ -55,11 +94,11 @@ class TestRunBusinessScenario:
             },
             time_horizon=12,
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
         # Low profit scenario
-        result_low = run_business_scenario(
+        result_low = business_scenario_runner(
             scenario_name="Low profit",
             revenue_assumptions={
                 "base_revenue": 50000,
@@ -71,15 +110,15 @@ class TestRunBusinessScenario:
             },
             time_horizon=12,
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
         # High profit should have higher probability
         assert result_high['probability_of_profitability'] > result_low['probability_of_profitability']
 
-    def test_roi_analysis(self):
+    def test_roi_analysis(self, business_scenario_runner, seed):
         """Test ROI analysis when initial investment provided"""
-        result = run_business_scenario(
+        result = business_scenario_runner(
             scenario_name="ROI Test",
             revenue_assumptions={
                 "base_revenue": 100000,
@@ -91,38 +130,30 @@ class TestRunBusinessScenario:
                 "variable_costs": {"mean": 0.40, "std": 0.05}
             },
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed
         )
 
-        assert 'roi_analysis' in result
         assert result['roi_analysis'] is not None
-        assert 'mean_roi' in result['roi_analysis']
-        assert 'prob_positive_roi' in result['roi_analysis']
+        assert result['roi_analysis'].keys() >= {"mean_roi", "prob_positive_roi"}
 
-    def test_no_roi_analysis_without_investment(self):
+    def test_no_roi_analysis_without_investment(self, business_scenario_runner, seed_for):
         """Test that ROI analysis is None without initial investment"""
-        result = run_business_scenario(
-            scenario_name="No ROI Test",
-            revenue_assumptions={
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            cost_structure={
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+        result = business_scenario_runner(
+            scenario_name="Basic Test Scenario",
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed_for("Basic Test Scenario")
         )
 
         assert result['roi_analysis'] is None
 
-    def test_churn_rate_impact(self):
+    def test_churn_rate_impact(self, business_scenario_runner, seed):
         """Test impact of churn rate on outcomes"""
         # Scenario without churn
-        result_no_churn = run_business_scenario(
+        result_no_churn = business_scenario_runner(
             scenario_name="No churn",
             revenue_assumptions={
                 "base_revenue": 100000,
@@ -134,11 +165,11 @@ class TestRunBusinessScenario:
             },
             time_horizon=12,
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
         # Scenario with churn
-        result_with_churn = run_business_scenario(
+        result_with_churn = business_scenario_runner(
             scenario_name="With churn",
             revenue_assumptions={
                 "base_revenue": 100000,
@@ -151,185 +182,223 @@ class TestRunBusinessScenario:
             },
             time_horizon=12,
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
         # No churn should have higher profit
         assert result_no_churn['expected_total_profit'] > result_with_churn['expected_total_profit']
 
-    def test_sensitivity_analysis_included(self):
+    def test_sensitivity_analysis_included(self, business_scenario_runner, seed_for):
         """Test that sensitivity analysis is included in results"""
-        result = run_business_scenario(
-            scenario_name="Sensitivity test",
-            revenue_assumptions={
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            cost_structure={
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+        result = business_scenario_runner(
+            scenario_name="Basic Test Scenario",
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed_for("Basic Test Scenario")
         )
 
-        assert 'sensitivity' in result
         assert len(result['sensitivity']) > 0
 
-    def test_risk_metrics(self):
+    def test_risk_metrics(self, business_scenario_runner, seed_for):
         """Test risk metrics calculation"""
-        result = run_business_scenario(
-            scenario_name="Risk metrics test",
-            revenue_assumptions={
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            cost_structure={
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+        result = business_scenario_runner(
+            scenario_name="Basic Test Scenario",
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed_for("Basic Test Scenario")
         )
 
         risk = result['risk_metrics']
-        assert 'downside_risk' in risk
-        assert 'upside_potential' in risk
-        assert 'outcome_range' in risk
 
         # Upside should be greater than downside
         assert risk['upside_potential'] > risk['downside_risk']
         # Range should be positive
         assert risk['outcome_range'] > 0
 
-    def test_percentile_outcomes(self):
+    def test_percentile_outcomes(self, business_scenario_runner, seed_for):
         """Test percentile outcomes calculation"""
-        result = run_business_scenario(
-            scenario_name="Percentile test",
-            revenue_assumptions={
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            cost_structure={
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+        result = business_scenario_runner(
+            scenario_name="Basic Test Scenario",
+            revenue_assumptions=DEFAULT_REVENUE,
+            cost_structure=DEFAULT_COSTS,
             time_horizon=12,
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed_for("Basic Test Scenario")
         )
 
         percentiles = result['percentile_outcomes']
-        assert 'pessimistic_P10' in percentiles
-        assert 'most_likely_P50' in percentiles
-        assert 'optimistic_P90' in percentiles
 
         # Should be in ascending order
         assert percentiles['pessimistic_P10'] < percentiles['most_likely_P50']
         assert percentiles['most_likely_P50'] < percentiles['optimistic_P90']
 
-    def test_reproducibility(self):
-        """Test reproducibility with same seed"""
+    @pytest.mark.parametrize("growth,churn", [
+        (0.05, 0.02),   # Compounding growth
+        (0.0, 0.0),     # Flat revenue: the series degenerates to H
+        (1e-12, 0.0),   # Near-flat, where a naive (g^H - 1) / (g - 1) cancels
+        (0.10, 1.0),    # Full churn wipes out revenue after one period
+        (0.05, 1.5),    # Revenue flips sign every period
+    ])
+    def test_compounded_revenue_sum_matches_period_loop(self, growth, churn):
+        """Test the closed-form revenue series against period-by-period compounding"""
+        expected = 0.0
+        revenue = 1.0
+        for _ in range(12):
+            revenue = revenue * (1 + growth) * (1 - churn)
+            expected += revenue
+
+        result = _compounded_revenue_sum(growth, churn, 12)
+
+        np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+    def test_seasonal_revenue_sum_matches_period_loop(self):
+        """Test the seasonal revenue kernel against period-by-period compounding"""
+        rng = np.random.default_rng(0)
+        growth = rng.normal(0.05, 0.02, 50)
+        churn = rng.normal(0.02, 0.01, 50)
+        seasonality = np.array([0.8, 1.0, 1.3, 0.9])
+
+        expected = np.zeros(50)
+        revenue = np.ones(50)
+        for t in range(10):
+            revenue = revenue * (1 + growth) * (1 - churn)
+            expected += revenue * seasonality[t % 4]
+
+        result = _seasonal_revenue_sum(growth, churn, seasonality, 10)
+
+        np.testing.assert_allclose(result, expected, rtol=1e-9)
+
+    def test_flat_seasonality_matches_closed_form(self, seed):
+        """Test that all-ones seasonality reproduces the unseasoned scenario"""
         params = {
-            "scenario_name": "Reproducibility",
-            "revenue_assumptions": {
-                "base_revenue": 100000,
-                "growth_rate": {"mean": 0.05, "std": 0.02}
-            },
-            "cost_structure": {
-                "fixed_costs": 50000,
-                "variable_costs": {"mean": 0.50, "std": 0.10}
-            },
+            "scenario_name": "Seasonality",
+            "cost_structure": DEFAULT_COSTS,
             "time_horizon": 12,
-            "num_simulations": 500,
-            "random_seed": 42
+            "num_simulations": 200,
+            "random_seed": seed
         }
 
-        result1 = run_business_scenario(**params)
-        result2 = run_business_scenario(**params)
+        plain = run_business_scenario(revenue_assumptions=DEFAULT_REVENUE, **params)
+        seasonal = run_business_scenario(
+            revenue_assumptions={**DEFAULT_REVENUE, "seasonality": [1.0] * 12}, **params
+        )
 
-        assert result1['expected_total_profit'] == result2['expected_total_profit']
-        assert result1['probability_of_profitability'] == result2['probability_of_profitability']
+        assert seasonal['expected_total_profit'] == pytest.approx(plain['expected_total_profit'], rel=1e-9)
+
+        with pytest.raises(ValueError, match="seasonality"):
+            run_business_scenario(revenue_assumptions={**DEFAULT_REVENUE, "seasonality": []}, **params)
+
+    def test_reproducibility(self, business_scenario_runner, seed_for, result_digest):
+        """Test that the simulated paths depend only on the seed, not on labels"""
+        params = {
+            "revenue_assumptions": DEFAULT_REVENUE,
+            "cost_structure": DEFAULT_COSTS,
+            "time_horizon": 12,
+            "num_simulations": 200,
+            "random_seed": seed_for("Basic Test Scenario")
+        }
+
+        # The baseline is usually already cached, so only the relabelled run is new work
+        baseline = business_scenario_runner(scenario_name="Basic Test Scenario", **params)
+        relabelled = run_business_scenario(scenario_name="Reproducibility", **params)
+
+        labels = {'scenario_name'}
+        assert result_digest(relabelled, ignore=labels) == result_digest(baseline, ignore=labels)
+        # Headline numbers bitwise, reporting any differing bits on failure
+        npt.assert_array_equal(
+            [baseline['expected_total_profit'], baseline['probability_of_profitability'],
+             *baseline['percentile_outcomes'].values()],
+            [relabelled['expected_total_profit'], relabelled['probability_of_profitability'],
+             *relabelled['percentile_outcomes'].values()]
+        )
+
+    def test_rng_matches_random_seed(self, seed, result_digest):
+        """Test that passing a Generator is equivalent to passing its seed"""
+        params = {
+            "scenario_name": "Generator",
+            "revenue_assumptions": DEFAULT_REVENUE,
+            "cost_structure": DEFAULT_COSTS,
+            "time_horizon": 12,
+            "num_simulations": 100
+        }
+
+        from_rng = run_business_scenario(**params, rng=np.random.default_rng(seed))
+        from_seed = run_business_scenario(**params, random_seed=seed)
+
+        assert result_digest(from_rng) == result_digest(from_seed)
 
 
 class TestRunSensitivityAnalysis:
     """Tests for run_sensitivity_analysis function"""
 
-    def test_basic_sensitivity(self):
-        """Test basic sensitivity analysis"""
-        result = run_sensitivity_analysis(
-            base_simulation_id="test_sim_001",
-            variables_to_test=["growth_rate", "variable_costs"],
-            variation_range={
+    @pytest.mark.parametrize("variables,ranges,expected_top", [
+        # Basic two-variable analysis
+        (
+            ["growth_rate", "variable_costs"],
+            {
                 "growth_rate": {"low": 0.03, "high": 0.07},
                 "variable_costs": {"low": 0.40, "high": 0.60}
             },
-            outcome_data={}
-        )
-
-        assert 'tornado_diagram_data' in result
-        assert 'key_drivers' in result
-        assert 'num_variables_tested' in result
-
-        assert result['base_simulation_id'] == "test_sim_001"
-        assert result['num_variables_tested'] == 2
-
-    def test_key_drivers_identification(self):
-        """Test that key drivers are properly identified"""
-        result = run_sensitivity_analysis(
-            base_simulation_id="test_sim_002",
-            variables_to_test=["var1", "var2", "var3", "var4"],
-            variation_range={
+            "variable_costs"
+        ),
+        # Key drivers: only the top 3 of 4 are reported
+        (
+            ["var1", "var2", "var3", "var4"],
+            {
                 "var1": {"low": 10, "high": 90},  # High impact
                 "var2": {"low": 45, "high": 55},  # Low impact
                 "var3": {"low": 20, "high": 80},  # Medium impact
                 "var4": {"low": 0, "high": 100}   # Highest impact
             },
-            outcome_data={}
-        )
-
-        # Should identify top 3 drivers
-        assert len(result['key_drivers']) == 3
-        # var4 should be first (highest impact)
-        assert result['key_drivers'][0] == "var4"
-
-    def test_tornado_diagram_sorting(self):
-        """Test that tornado diagram is sorted by impact"""
-        result = run_sensitivity_analysis(
-            base_simulation_id="test_sim_003",
-            variables_to_test=["low_impact", "high_impact", "medium_impact"],
-            variation_range={
+            "var4"
+        ),
+        # Tornado ordering independent of input order
+        (
+            ["low_impact", "high_impact", "medium_impact"],
+            {
                 "low_impact": {"low": 95, "high": 105},
                 "high_impact": {"low": 50, "high": 150},
                 "medium_impact": {"low": 70, "high": 130}
             },
+            "high_impact"
+        ),
+        # Variables without a variation range are skipped
+        (
+            ["var1", "var2", "missing_var"],
+            {
+                "var1": {"low": 10, "high": 20},
+                "var2": {"low": 30, "high": 40}
+            },
+            "var1"
+        ),
+    ])
+    def test_sensitivity_invariants(self, variables, ranges, expected_top):
+        """Test tornado data, ordering and key drivers against one oracle"""
+        result = run_sensitivity_analysis(
+            base_simulation_id="test_sim",
+            variables_to_test=variables,
+            variation_range=ranges,
             outcome_data={}
         )
 
+        assert result['base_simulation_id'] == "test_sim"
+        assert result['num_variables_tested'] == len(variables)
+
+        # Only variables with a range are analyzed
         tornado_data = result['tornado_diagram_data']
-        impacts = [data['impact'] for data in tornado_data.values()]
+        assert set(tornado_data) == set(variables) & ranges.keys()
 
-        # Should be in descending order
+        # Sorted by impact, descending
+        impacts = [data['impact'] for data in tornado_data.values()]
         assert impacts == sorted(impacts, reverse=True)
 
-    def test_missing_variation_range(self):
-        """Test handling of missing variation range"""
-        result = run_sensitivity_analysis(
-            base_simulation_id="test_sim_004",
-            variables_to_test=["var1", "var2", "missing_var"],
-            variation_range={
-                "var1": {"low": 10, "high": 20},
-                "var2": {"low": 30, "high": 40}
-                # missing_var not in range
-            },
-            outcome_data={}
-        )
-
-        # Should only analyze variables with ranges
-        assert len(result['tornado_diagram_data']) == 2
-        assert 'missing_var' not in result['tornado_diagram_data']
+        # Top 3 drivers, led by the widest range
+        assert result['key_drivers'] == list(tornado_data)[:3]
+        assert result['key_drivers'][0] == expected_top
 
 
 class TestInterpretationFunctions:
@@ -373,6 +442,7 @@ class TestInterpretationFunctions:
 class TestEdgeCases:
     """Test edge cases and error handling"""
 
+    @pytest.mark.timeout(1)
     def test_zero_time_horizon(self):
         """Test with zero time horizon"""
         with pytest.raises((ValueError, ZeroDivisionError)):
@@ -390,7 +460,26 @@ class TestEdgeCases:
                 num_simulations=100
             )
 
-    def test_negative_base_revenue(self):
+    def test_no_uncertain_inputs(self, seed):
+        """Test a fully deterministic scenario (every input falls back to its default)"""
+        result = run_business_scenario(
+            scenario_name="Deterministic",
+            revenue_assumptions={"base_revenue": 1000},
+            cost_structure={"fixed_costs": 10},
+            time_horizon=12,
+            num_simulations=100,
+            random_seed=seed
+        )
+
+        # 1000 * (1.05 + ... + 1.05^12) * 0.5 - 10 * 12
+        expected = 1000 * sum(1.05 ** t for t in range(1, 13)) * 0.5 - 120
+        assert result['expected_total_profit'] == pytest.approx(expected)
+        assert result['statistics']['std'] == pytest.approx(0.0, abs=1e-9)
+        assert result['probability_of_profitability'] == 1.0
+        assert result['sensitivity'] == {}
+
+    @pytest.mark.slow
+    def test_negative_base_revenue(self, rng):
         """Test handling of negative base revenue"""
         result = run_business_scenario(
             scenario_name="Negative revenue",
@@ -404,13 +493,14 @@ class TestEdgeCases:
             },
             time_horizon=12,
             num_simulations=100,
-            random_seed=42
+            rng=rng
         )
 
         # Should result in negative profit
         assert result['expected_total_profit'] < 0
 
-    def test_extreme_churn_rate(self):
+    @pytest.mark.slow
+    def test_extreme_churn_rate(self, rng):
         """Test with extreme (100%) churn rate"""
         result = run_business_scenario(
             scenario_name="100% churn",
@@ -425,7 +515,7 @@ class TestEdgeCases:
             },
             time_horizon=12,
             num_simulations=100,
-            random_seed=42
+            rng=rng
         )
 
         # Revenue should approach zero with 100% churn
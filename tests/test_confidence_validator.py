@@ -4,6 +4,7 @@ Unit tests for confidence validation tools
 
 import pytest
 import numpy as np
+import numpy.testing as npt
 from tools.confidence_validator import (
     validate_reasoning_confidence,
     test_assumption_robustness,
@@ -13,11 +14,50 @@ from tools.confidence_validator import (
 )
 
 
+# Full result contract of validate_reasoning_confidence, checked once in the schema test
+EXPECTED_KEYS = frozenset({
+    "decision_context",
+    "confidence_level",
+    "confidence_qualifier",
+    "expected_outcome",
+    "percentiles",
+    "confidence_interval_95",
+    "sensitivity_analysis",
+    "key_risk_factors",
+    "num_simulations",
+    "success_threshold",
+    "statistics"
+})
+
+
 class TestValidateReasoningConfidence:
     """Tests for validate_reasoning_confidence function"""
 
-    def test_basic_validation(self):
-        """Test basic confidence validation"""
+    @pytest.fixture(scope="class")
+    def validated(self, seed_for):
+        """
+        Validate a single normal "value" assumption, once per parameter set
+
+        Runs with the same mean and std share a seed, so they see identical draws.
+        """
+        cache = {}
+
+        def go(mean, std, threshold, comparison=">="):
+            key = (mean, std, threshold, comparison)
+            if key not in cache:
+                cache[key] = validate_reasoning_confidence(
+                    f"value {comparison} {threshold}",
+                    {"value": {"distribution": "normal", "params": {"mean": mean, "std": std}}},
+                    {"threshold": threshold, "comparison": comparison},
+                    1000,
+                    seed_for(f"value ~ N({mean}, {std})")
+                )
+            return cache[key]
+
+        return go
+
+    def test_basic_validation(self, seed):
+        """Test basic confidence validation and the complete result schema"""
         result = validate_reasoning_confidence(
             decision_context="Test investment decision",
             assumptions={
@@ -27,86 +67,49 @@ class TestValidateReasoningConfidence:
                 }
             },
             success_criteria={"threshold": 0.10, "comparison": ">="},
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed
         )
 
-        assert 'decision_context' in result
-        assert 'confidence_level' in result
-        assert 'expected_outcome' in result
-        assert 'percentiles' in result
-        assert 'sensitivity_analysis' in result
-
+        assert result.keys() == EXPECTED_KEYS
         assert 0 <= result['confidence_level'] <= 1
         assert result['decision_context'] == "Test investment decision"
 
-    def test_high_confidence_scenario(self):
+    def test_high_confidence_scenario(self, validated):
         """Test scenario with high confidence"""
-        result = validate_reasoning_confidence(
-            decision_context="High confidence test",
-            assumptions={
-                "value": {
-                    "distribution": "normal",
-                    "params": {"mean": 100, "std": 5}  # Low uncertainty
-                }
-            },
-            success_criteria={"threshold": 80, "comparison": ">="},
-            num_simulations=1000,
-            random_seed=42
-        )
+        result = validated(100, 5, 80)  # Low uncertainty
 
         # With mean=100 and threshold=80, confidence should be very high
         assert result['confidence_level'] > 0.95
 
-    def test_low_confidence_scenario(self):
+    def test_low_confidence_scenario(self, validated):
         """Test scenario with low confidence"""
-        result = validate_reasoning_confidence(
-            decision_context="Low confidence test",
-            assumptions={
-                "value": {
-                    "distribution": "normal",
-                    "params": {"mean": 100, "std": 30}  # High uncertainty
-                }
-            },
-            success_criteria={"threshold": 120, "comparison": ">="},
-            num_simulations=1000,
-            random_seed=42
-        )
+        result = validated(100, 30, 120)  # High uncertainty
 
         # With mean=100 and threshold=120, confidence should be low
         assert result['confidence_level'] < 0.5
 
-    def test_different_comparison_operators(self):
-        """Test different comparison operators"""
-        base_assumptions = {
-            "value": {
-                "distribution": "normal",
-                "params": {"mean": 100, "std": 10}
-            }
-        }
+    @pytest.mark.parametrize("comparison,expected", [
+        (">=", 0.8413),
+        (">", 0.8413),
+        ("<=", 0.1587),
+        ("<", 0.1587),
+    ])
+    def test_different_comparison_operators(self, validated, comparison, expected):
+        """Test each comparison operator against the analytic probability"""
+        result = validated(100, 10, 90, comparison)
 
-        # Test >=
-        result_gte = validate_reasoning_confidence(
-            "Test >=",
-            base_assumptions,
-            {"threshold": 90, "comparison": ">="},
-            1000,
-            42
-        )
+        # P(X >= 90) for X ~ N(100, 10) is Phi(1); ties have probability zero
+        assert result['confidence_level'] == pytest.approx(expected, abs=0.03)
 
-        # Test >
-        result_gt = validate_reasoning_confidence(
-            "Test >",
-            base_assumptions,
-            {"threshold": 90, "comparison": ">"},
-            1000,
-            42
-        )
+    def test_inclusive_comparison_at_least_strict(self, validated):
+        """Test that >= is never less confident than > on the same draws"""
+        gte = validated(100, 10, 90, ">=")
+        gt = validated(100, 10, 90, ">")
 
-        # >= should have slightly higher or equal confidence than >
-        assert result_gte['confidence_level'] >= result_gt['confidence_level']
+        assert gte['confidence_level'] >= gt['confidence_level']
 
-    def test_multiple_assumptions(self):
+    def test_multiple_assumptions(self, seed):
         """Test with multiple assumptions"""
         result = validate_reasoning_confidence(
             decision_context="Multiple assumptions",
@@ -125,33 +128,33 @@ class TestValidateReasoningConfidence:
                 }
             },
             success_criteria={"threshold": 30000000, "comparison": ">="},
-            num_simulations=1000,
-            random_seed=42
+            num_simulations=200,
+            random_seed=seed
         )
 
-        assert 'sensitivity_analysis' in result
         # Should have sensitivity for all three variables
         assert len(result['sensitivity_analysis']) == 3
 
-    def test_reproducibility(self):
-        """Test that results are reproducible with same seed"""
-        params = {
-            "decision_context": "Reproducibility test",
-            "assumptions": {
-                "x": {"distribution": "normal", "params": {"mean": 100, "std": 10}}
-            },
-            "success_criteria": {"threshold": 90, "comparison": ">="},
-            "num_simulations": 500,
-            "random_seed": 42
-        }
-
-        result1 = validate_reasoning_confidence(**params)
-        result2 = validate_reasoning_confidence(**params)
+    def test_reproducibility(self, validated, seed_for, result_digest):
+        """Test that the simulated outcomes depend only on the seed, not on labels"""
+        cached = validated(100, 10, 90)
+        relabelled = validate_reasoning_confidence(
+            decision_context="Reproducibility test",
+            assumptions={"value": {"distribution": "normal", "params": {"mean": 100, "std": 10}}},
+            success_criteria={"threshold": 90, "comparison": ">="},
+            num_simulations=1000,
+            random_seed=seed_for("value ~ N(100, 10)")
+        )
 
-        assert result1['confidence_level'] == result2['confidence_level']
-        assert result1['expected_outcome'] == result2['expected_outcome']
+        labels = {'decision_context'}
+        assert result_digest(relabelled, ignore=labels) == result_digest(cached, ignore=labels)
+        # Headline numbers bitwise, reporting any differing bits on failure
+        npt.assert_array_equal(
+            [cached['confidence_level'], cached['expected_outcome'], *cached['percentiles'].values()],
+            [relabelled['confidence_level'], relabelled['expected_outcome'], *relabelled['percentiles'].values()]
+        )
 
-    def test_key_risk_identification(self):
+    def test_key_risk_identification(self, seed):
         """Test that key risk factors are properly identified"""
         result = validate_reasoning_confidence(
             decision_context="Risk identification test",
@@ -167,100 +170,119 @@ class TestValidateReasoningConfidence:
             },
             success_criteria={"threshold": 100, "comparison": ">="},
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
-        assert 'key_risk_factors' in result
         # high_impact should be identified as key risk
         risk_vars = [r['variable'] for r in result['key_risk_factors']]
         assert 'high_impact' in risk_vars
 
 
+# Robustness configurations, keyed by base answer
+ROBUSTNESS_SCENARIOS = {
+    "Invest in Project A": {
+        "critical_assumptions": [
+            {
+                "name": "roi",
+                "distribution": "normal",
+                "params": {"mean": 0.15, "std": 0.05}
+            }
+        ],
+        "stress_test_ranges": {
+            "roi": {"min": 0.05, "max": 0.25}
+        },
+        "outcome_function_str": "sum of assumptions"
+    },
+    "Stable recommendation": {
+        "critical_assumptions": [
+            {
+                "name": "stable_var",
+                "distribution": "normal",
+                "params": {"mean": 100, "std": 5}  # Low variance
+            }
+        ],
+        "stress_test_ranges": {
+            "stable_var": {"min": 80, "max": 120}
+        },
+        "outcome_function_str": "stable outcome"
+    },
+    "Fragile recommendation": {
+        "critical_assumptions": [
+            {
+                "name": "volatile_var",
+                "distribution": "uniform",
+                "params": {"min": 0, "max": 200}  # High variance
+            }
+        ],
+        "stress_test_ranges": {
+            "volatile_var": {"min": 0, "max": 200}
+        },
+        "outcome_function_str": "volatile outcome"
+    },
+}
+
+
 class TestAssumptionRobustness:
     """Tests for test_assumption_robustness function"""
 
-    def test_basic_robustness(self):
-        """Test basic assumption robustness testing"""
-        result = test_assumption_robustness(
-            base_answer="Invest in Project A",
-            critical_assumptions=[
-                {
-                    "name": "roi",
-                    "distribution": "normal",
-                    "params": {"mean": 0.15, "std": 0.05}
-                }
-            ],
-            stress_test_ranges={
-                "roi": {"min": 0.05, "max": 0.25}
-            },
-            outcome_function_str="sum of assumptions",
-            num_scenarios=500,
-            random_seed=42
-        )
+    @pytest.fixture(scope="class")
+    def robustness_results(self, seed_for):
+        """Run every robustness configuration once for the whole class"""
+        return {
+            base_answer: test_assumption_robustness(
+                base_answer=base_answer,
+                num_scenarios=500,
+                random_seed=seed_for(base_answer),
+                **config
+            )
+            for base_answer, config in ROBUSTNESS_SCENARIOS.items()
+        }
 
-        assert 'base_answer' in result
-        assert 'robustness_score' in result
-        assert 'breaking_points' in result
-        assert 'confidence_qualifier' in result
+    def test_basic_robustness(self, robustness_results):
+        """Test basic assumption robustness testing"""
+        result = robustness_results["Invest in Project A"]
 
         assert 0 <= result['robustness_score'] <= 1
         assert result['base_answer'] == "Invest in Project A"
 
-    def test_robust_scenario(self):
+    def test_robust_scenario(self, robustness_results):
         """Test scenario with high robustness"""
-        result = test_assumption_robustness(
-            base_answer="Stable recommendation",
-            critical_assumptions=[
-                {
-                    "name": "stable_var",
-                    "distribution": "normal",
-                    "params": {"mean": 100, "std": 5}  # Low variance
-                }
-            ],
-            stress_test_ranges={
-                "stable_var": {"min": 80, "max": 120}
-            },
-            outcome_function_str="stable outcome",
-            num_scenarios=500,
-            random_seed=42
-        )
+        result = robustness_results["Stable recommendation"]
 
         # Should have high robustness score
         assert result['robustness_score'] > 0.7
 
-    def test_breaking_points_identified(self):
+    def test_breaking_points_identified(self, robustness_results):
         """Test that breaking points are identified"""
-        result = test_assumption_robustness(
-            base_answer="Fragile recommendation",
-            critical_assumptions=[
-                {
-                    "name": "volatile_var",
-                    "distribution": "uniform",
-                    "params": {"min": 0, "max": 200}  # High variance
-                }
-            ],
-            stress_test_ranges={
-                "volatile_var": {"min": 0, "max": 200}
-            },
-            outcome_function_str="volatile outcome",
-            num_scenarios=500,
-            random_seed=42
-        )
+        result = robustness_results["Fragile recommendation"]
 
         # Should have some breaking points
         assert len(result['breaking_points']) > 0
 
+        # Reported strongest first, and consistent with the scenario counts
+        deviations = [abs(point['deviation_from_base']) for point in result['breaking_points']]
+        assert deviations == sorted(deviations, reverse=True)
+        assert len(deviations) == min(5, result['stress_test_summary']['unstable_scenarios'])
+
 
 class TestInterpretationFunctions:
     """Tests for interpretation helper functions"""
 
-    def test_interpret_confidence(self):
+    @pytest.mark.parametrize("level,label", [
+        (0.95, "VERY HIGH"),
+        (0.85, "HIGH"),
+        (0.65, "MODERATE"),
+        (0.50, "LOW"),
+        (0.30, "VERY LOW"),
+        # Bin edges belong to the higher band
+        (0.90, "VERY HIGH"),
+        (0.75, "HIGH"),
+        (0.60, "MODERATE"),
+        (0.40, "LOW"),
+    ])
+    def test_interpret_confidence(self, level, label):
         """Test confidence interpretation"""
-        assert _interpret_confidence(0.95) == "VERY HIGH"
-        assert _interpret_confidence(0.85) == "HIGH"
-        assert _interpret_confidence(0.65) == "MODERATE"
-        assert _interpret_confidence(0.50) == "LOW"
-        assert _interpret_confidence(0.30) == "VERY LOW"
+        assert _interpret_confidence(level) == label
 
     def test_interpret_robustness(self):
         """Test robustness interpretation"""
@@ -288,29 +310,42 @@ class TestInterpretationFunctions:
         assert risks[0]['variable'] == "high_risk"  # Should be first
         assert risks[0]['influence'] == 0.75
 
+    def test_identify_key_risks_ranking(self):
+        """Test that key risks are ranked regardless of input order"""
+        sensitivity = {
+            "small": 0.25,
+            "largest": 0.90,
+            "medium": 0.40,
+            "large": 0.60
+        }
+
+        risks = _identify_key_risks(sensitivity, {}, threshold=0.20)
+
+        assert [r['variable'] for r in risks] == ["largest", "large", "medium", "small"]
+
 
 class TestEdgeCases:
     """Test edge cases and error handling"""
 
-    def test_zero_variance_assumption(self):
+    def test_zero_variance_assumption(self, seed):
         """Test with zero variance (deterministic) assumption"""
         result = validate_reasoning_confidence(
             decision_context="Zero variance test",
             assumptions={
                 "deterministic": {
                     "distribution": "normal",
-                    "params": {"mean": 100, "std": 0.0001}  # Near zero variance
+                    "params": {"mean": 100, "std": 0.0}  # Deterministic
                 }
             },
             success_criteria={"threshold": 90, "comparison": ">="},
             num_simulations=100,
-            random_seed=42
+            random_seed=seed
         )
 
-        # Should still work, confidence should be very high or very low
-        assert result['confidence_level'] in [0.0, 1.0] or 0.95 < result['confidence_level'] <= 1.0
+        # Every draw equals the mean, which clears the threshold
+        assert result['confidence_level'] == 1.0
 
-    def test_threshold_at_mean(self):
+    def test_threshold_at_mean(self, seed):
         """Test threshold exactly at mean"""
         result = validate_reasoning_confidence(
             decision_context="Threshold at mean",
@@ -322,12 +357,13 @@ class TestEdgeCases:
             },
             success_criteria={"threshold": 100, "comparison": ">="},
             num_simulations=1000,
-            random_seed=42
+            random_seed=seed
         )
 
         # Confidence should be around 50%
         assert 0.45 < result['confidence_level'] < 0.55
 
+    @pytest.mark.timeout(1)
     def test_invalid_distribution(self):
         """Test with invalid distribution type"""
         with pytest.raises((ValueError, KeyError)):
@@ -343,6 +379,21 @@ class TestEdgeCases:
                 num_simulations=100
             )
 
+    @pytest.mark.parametrize("distribution,params", [
+        ("normal", {"mean": 100, "std": -10}),
+        ("triangular", {"left": 10, "mode": 5, "right": 20}),
+        ("beta", {"a": -1, "b": 2}),
+    ])
+    def test_invalid_parameters(self, distribution, params):
+        """Test that out-of-range parameters raise instead of skewing the confidence"""
+        with pytest.raises(ValueError, match="Invalid"):
+            validate_reasoning_confidence(
+                decision_context="Invalid parameters",
+                assumptions={"x": {"distribution": distribution, "params": params}},
+                success_criteria={"threshold": 90, "comparison": ">="},
+                num_simulations=100
+            )
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,74 @@
+"""
+Unit tests for compiled Monte Carlo kernels
+"""
+
+import pytest
+import numpy as np
+from scipy import stats
+from engine import kernels
+
+
+class TestMoments:
+    """Tests for the single-pass moment reduction"""
+
+    @pytest.mark.parametrize("size", [1, 10, 4096, 10001])
+    def test_matches_numpy_and_scipy(self, size):
+        """Test moments against NumPy/SciPy reference statistics"""
+        values = np.random.default_rng(42).lognormal(0, 1, size)
+
+        n, mean, m2, m3, m4, lo, hi = kernels.moments(values)
+
+        assert n == size
+        assert mean == pytest.approx(np.mean(values))
+        assert m2 / n == pytest.approx(np.var(values))
+        assert lo == np.min(values)
+        assert hi == np.max(values)
+        if size > 1:
+            assert np.sqrt(n) * m3 / m2 ** 1.5 == pytest.approx(stats.skew(values))
+            assert n * m4 / m2 ** 2 - 3 == pytest.approx(stats.kurtosis(values))
+
+    def test_numpy_fallback_matches(self):
+        """Test that the NumPy fallback agrees with the main entry point"""
+        values = np.random.default_rng(7).normal(100, 10, 5000)
+
+        np.testing.assert_allclose(
+            kernels.moments(values), kernels._moments_numpy(values), rtol=1e-9
+        )
+
+    def test_merge_matches_whole_array(self):
+        """Test that merging chunk moments equals moments of the full array"""
+        values = np.random.default_rng(3).gamma(2.0, 1.5, 9000)
+
+        merged = kernels.merge_moments(kernels.moments(values[:2500]), kernels.moments(values[2500:]))
+
+        np.testing.assert_allclose(merged, kernels.moments(values), rtol=1e-9)
+
+    def test_empty_input(self):
+        """Test that empty input raises an error"""
+        with pytest.raises(ValueError):
+            kernels.moments(np.array([]))
+
+
+@pytest.mark.skipif(not kernels.NUMBA_AVAILABLE, reason="numba not installed")
+class TestPpfUfuncs:
+    """Tests for compiled inverse-CDF ufuncs"""
+
+    @pytest.mark.parametrize("distribution,params,reference", [
+        ("normal", (100.0, 10.0), lambda u: stats.norm.ppf(u, 100, 10)),
+        ("lognormal", (0.0, 0.5), lambda u: stats.lognorm.ppf(u, 0.5)),
+        ("exponential", (2.0,), lambda u: stats.expon.ppf(u, scale=2.0)),
+        ("triangular", (0.0, 1.0, 3.0), lambda u: stats.triang.ppf(u, 1 / 3, 0, 3)),
+    ])
+    def test_matches_scipy(self, distribution, params, reference):
+        """Test compiled inverse CDFs against scipy.stats, including the tails"""
+        u = np.concatenate([[1e-300, 1e-10, 0.5, 1 - 1e-12], np.random.default_rng(0).random(10000)])
+
+        np.testing.assert_allclose(kernels.ppf_ufunc(distribution)(u, *params), reference(u), rtol=1e-12)
+
+    def test_unsupported_distribution(self):
+        """Test that distributions without a closed form have no ufunc"""
+        assert kernels.ppf_ufunc("beta") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
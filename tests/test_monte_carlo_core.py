@@ -2,13 +2,21 @@
 Unit tests for Monte Carlo core engine
 """
 
+import logging
+import pickle
+
 import pytest
 import numpy as np
+from scipy import stats
 from engine.monte_carlo_core import (
     MonteCarloEngine,
     Variable,
     DistributionType,
-    create_variable_from_dict
+    create_variable_from_dict,
+    SampleView,
+    product_of_variables,
+    sum_of_variables,
+    _cholesky_cached
 )
 
 
@@ -55,6 +63,43 @@ class TestVariable:
         assert np.min(samples) >= 0
         assert np.max(samples) <= 100
 
+    def test_inverse_cdf_sampling(self):
+        """Test sampling from uniform points via the inverse CDF"""
+        u = np.linspace(0.01, 0.99, 99)
+        cases = [
+            (DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            (DistributionType.LOGNORMAL, {'mean': 0, 'sigma': 0.5}),
+            (DistributionType.UNIFORM, {'min': 50, 'max': 150}),
+            (DistributionType.TRIANGULAR, {'left': 0, 'mode': 50, 'right': 100}),
+            (DistributionType.EXPONENTIAL, {'scale': 2.0}),
+            (DistributionType.BETA, {'a': 2, 'b': 5}),
+            (DistributionType.GAMMA, {'shape': 2, 'scale': 1.5}),
+        ]
+
+        for distribution, params in cases:
+            var = Variable("x", distribution, params)
+            samples = var.sample(len(u), u=u)
+
+            assert len(samples) == len(u)
+            assert np.all(np.isfinite(samples))
+            assert np.all(np.diff(samples) > 0)  # Inverse CDF is monotonic
+
+        normal = Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10})
+        assert normal.ppf(np.array([0.5]))[0] == pytest.approx(100)
+
+    def test_from_standard_normal_matches_inverse_cdf(self):
+        """Test that the direct copula transforms agree with ppf(ndtr(z))"""
+        z = np.linspace(-3, 3, 61)
+        u = stats.norm.cdf(z)
+
+        for distribution, params in [
+            (DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            (DistributionType.LOGNORMAL, {'mean': 0, 'sigma': 0.5}),
+            (DistributionType.GAMMA, {'shape': 2, 'scale': 1.5}),
+        ]:
+            var = Variable("x", distribution, params)
+            np.testing.assert_allclose(var.from_standard_normal(z), var.ppf(u), rtol=1e-9)
+
     def test_unsupported_distribution(self):
         """Test that unsupported distribution raises error"""
         var = Variable(
@@ -65,12 +110,89 @@ class TestVariable:
         with pytest.raises(ValueError):
             var.sample(100)
 
+    def test_inverse_cdf_resolved_lazily(self, monkeypatch):
+        """Test that the inverse CDF is only resolved (compiled) when a run needs it"""
+        import engine.monte_carlo_core as core
+
+        calls = []
+        monkeypatch.setattr(core, 'ppf_ufunc', lambda name: calls.append(name))
+
+        var = Variable("x", DistributionType.NORMAL, {'mean': 0, 'std': 1})
+        MonteCarloEngine(random_seed=42, qmc=False).run_simulation([var], lambda v: v['x'], 100)
+        assert calls == []
+
+        MonteCarloEngine(random_seed=42).run_simulation([var], lambda v: v['x'], 100)
+        assert calls
+
+    def test_variable_pickles(self):
+        """Test that variables round-trip through pickle (process pools, caching)"""
+        var = Variable("x", DistributionType.TRIANGULAR, {'left': 1, 'mode': 2, 'right': 4})
+        clone = pickle.loads(pickle.dumps(var))
+
+        assert clone == var
+        np.testing.assert_array_equal(
+            clone.sample(100, np.random.default_rng(42)),
+            var.sample(100, np.random.default_rng(42))
+        )
+
+    def test_params_edits_honoured(self):
+        """Test that parameters changed after construction are used when sampling"""
+        var = Variable("x", DistributionType.NORMAL, {'mean': 0, 'std': 1})
+        var.params['mean'] = 1000
+
+        assert var.sample(1000, np.random.default_rng(42)).mean() > 900
+        assert var.ppf(np.array([0.5]))[0] == pytest.approx(1000)
+
+    @pytest.mark.parametrize("distribution,params", [
+        (DistributionType.NORMAL, {'mean': 100, 'std': -10}),
+        (DistributionType.LOGNORMAL, {'mean': 0, 'sigma': -0.5}),
+        (DistributionType.UNIFORM, {'min': 0, 'max': float('inf')}),
+        (DistributionType.TRIANGULAR, {'left': 10, 'mode': 5, 'right': 20}),
+        (DistributionType.TRIANGULAR, {'left': 5, 'mode': 5, 'right': 5}),
+        (DistributionType.EXPONENTIAL, {'scale': -1.0}),
+        (DistributionType.BETA, {'a': -1, 'b': 5}),
+        (DistributionType.GAMMA, {'shape': 0, 'scale': 1.5}),
+        (DistributionType.NORMAL, {'mean': 100, 'std': float('nan')}),
+    ])
+    def test_invalid_parameters_rejected(self, distribution, params):
+        """Test that out-of-range parameters fail at construction, for both sampling paths"""
+        with pytest.raises(ValueError, match="Invalid"):
+            Variable("x", distribution, params)
+
+    def test_degenerate_parameters_accepted(self):
+        """Test that zero-spread parameters stay valid, as the RNG samplers allow them"""
+        normal = Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 0.0})
+        uniform = Variable("y", DistributionType.UNIFORM, {'min': 5, 'max': 5})
+
+        np.testing.assert_array_equal(normal.sample(10, u=np.full(10, 0.3)), 100.0)
+        np.testing.assert_array_equal(uniform.sample(10, random_state=np.random.default_rng(1)), 5.0)
+
+    def test_uniform_reversed_bounds_accepted(self):
+        """Test that reversed uniform bounds sample between them on both paths"""
+        var = Variable("x", DistributionType.UNIFORM, {'min': 2, 'max': 1})
+
+        for samples in (var.sample(1000, random_state=np.random.default_rng(1)),
+                        var.sample(1000, u=np.random.default_rng(2).random(1000))):
+            assert np.all((samples >= 1) & (samples <= 2))
+
+    def test_legacy_random_state_is_wrapped(self):
+        """Test that a legacy RandomState seeds a PCG64 Generator reproducibly"""
+        var = Variable("x", DistributionType.NORMAL, {'mean': 0, 'std': 1})
+
+        draws1 = var.sample(100, random_state=np.random.RandomState(7))
+        draws2 = var.sample(100, random_state=np.random.RandomState(7))
+        np.testing.assert_array_equal(draws1, draws2)
+
+        engine = MonteCarloEngine(random_seed=np.random.RandomState(7))
+        assert isinstance(engine.random_state.bit_generator, np.random.PCG64)
+
 
 class TestMonteCarloEngine:
     """Tests for MonteCarloEngine class"""
 
-    def test_reproducibility_with_seed(self):
-        """Test that simulations are reproducible with same seed"""
+    @pytest.mark.parametrize("qmc", [True, False], ids=["sobol", "pcg64"])
+    def test_reproducibility_with_seed(self, qmc):
+        """Test that simulations are bitwise reproducible with same seed, for each sampler"""
         variables = [
             Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
             Variable("y", DistributionType.UNIFORM, {'min': 50, 'max': 150})
@@ -79,10 +201,10 @@ class TestMonteCarloEngine:
         def outcome_func(values):
             return values['x'] + values['y']
 
-        engine1 = MonteCarloEngine(random_seed=42)
+        engine1 = MonteCarloEngine(random_seed=42, qmc=qmc)
         results1 = engine1.run_simulation(variables, outcome_func, 100)
 
-        engine2 = MonteCarloEngine(random_seed=42)
+        engine2 = MonteCarloEngine(random_seed=42, qmc=qmc)
         results2 = engine2.run_simulation(variables, outcome_func, 100)
 
         np.testing.assert_array_equal(results1['outcomes'], results2['outcomes'])
@@ -104,6 +226,412 @@ class TestMonteCarloEngine:
 
         assert not np.array_equal(results1['outcomes'], results2['outcomes'])
 
+    def test_qmc_and_pseudo_random_paths(self):
+        """Test that Sobol' sampling converges faster than pseudo-random sampling"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10})
+        ]
+
+        def outcome_func(values):
+            return values['x']
+
+        qmc_results = MonteCarloEngine(random_seed=42).run_simulation(variables, outcome_func, 1024)
+        mc_results = MonteCarloEngine(random_seed=42, qmc=False).run_simulation(variables, outcome_func, 1024)
+
+        assert len(qmc_results['outcomes']) == 1024
+        assert len(mc_results['outcomes']) == 1024
+        assert abs(qmc_results['statistics']['mean'] - 100) < 0.1
+        assert 90 < mc_results['statistics']['mean'] < 110
+
+    def test_scalar_outcome_function_fallback(self):
+        """Test that scalar-only outcome functions are evaluated per simulation"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10})
+        ]
+
+        def outcome_func(values):
+            # Branching on the value only works for scalars
+            return 1.0 if values['x'] > 100 else 0.0
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(variables, outcome_func, 1000)
+
+        assert len(results['outcomes']) == 1000
+        assert set(np.unique(results['outcomes'])) <= {0.0, 1.0}
+        assert 0.45 < results['statistics']['mean'] < 0.55
+
+    def test_fallback_only_for_scalar_only_errors(self, caplog):
+        """Test that genuine bugs in an outcome function propagate instead of falling back"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10})
+        ]
+        engine = MonteCarloEngine(random_seed=42)
+
+        def validating_outcome(values):
+            raise ValueError("price must be non-negative")
+
+        with pytest.raises(KeyError):
+            engine.run_simulation(variables, lambda values: values['missing'], 100)
+        with pytest.raises(ValueError, match="non-negative"):
+            engine.run_simulation(variables, validating_outcome, 100)
+
+        with caplog.at_level(logging.DEBUG, logger="engine.monte_carlo_core"):
+            engine.run_simulation(variables, lambda values: float(values['x']), 100)
+        assert "per simulation" in caplog.text
+
+    def test_batched_family_sampling(self):
+        """Test that per-family batched draws match drawing each variable separately"""
+        variables = [
+            Variable("a", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("b", DistributionType.UNIFORM, {'min': 0, 'max': 1}),
+            Variable("c", DistributionType.NORMAL, {'mean': -5, 'std': 2}),
+            Variable("d", DistributionType.TRIANGULAR, {'left': 0, 'mode': 2, 'right': 3}),
+            Variable("e", DistributionType.UNIFORM, {'min': 10, 'max': 20})
+        ]
+        engine = MonteCarloEngine(random_seed=42)
+        uniform = engine._sobol_points(len(variables), 256)
+
+        # Inverse-CDF path: identical to the per-variable transforms
+        batched = engine._sample_all(variables, 256, uniform)
+        expected = np.column_stack([var.sample(256, u=uniform[:, j]) for j, var in enumerate(variables)])
+        np.testing.assert_allclose(batched, expected, rtol=1e-12)
+
+        # Pseudo-random path: each column keeps its own parameters
+        draws = engine._sample_all(variables, 20000)
+        np.testing.assert_allclose(draws.mean(axis=0), [100, 0.5, -5, 5 / 3, 15], rtol=0.02, atol=0.02)
+
+        with pytest.raises(ValueError, match="Unsupported distribution"):
+            engine._sample_all([Variable("x", "invalid", {})], 10)
+
+    def test_vectorized_flag(self):
+        """Test that vectorized=True calls the outcome function once and False per simulation"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10})
+        ]
+        calls = []
+
+        def outcome_func(values):
+            calls.append(np.ndim(values['x']))
+            return values['x'] * 2
+
+        engine = MonteCarloEngine(random_seed=42)
+        vectorized = engine.run_simulation(variables, outcome_func, 100, vectorized=True)
+        assert calls == [1]
+
+        calls.clear()
+        per_row = MonteCarloEngine(random_seed=42).run_simulation(variables, outcome_func, 100, vectorized=False)
+        assert calls == [0] * 100
+
+        np.testing.assert_allclose(vectorized['outcomes'], per_row['outcomes'])
+
+        # No silent fallback when the caller promised array support
+        with pytest.raises(ValueError, match="shape"):
+            engine.run_simulation(variables, lambda values: 1.0, 100, vectorized=True)
+
+    def test_spawned_generators(self):
+        """Test that spawned child generators are independent and reproducible"""
+        children1 = MonteCarloEngine(random_seed=42).spawn(2)
+        children2 = MonteCarloEngine(random_seed=42).spawn(2)
+
+        draws1 = [rng.standard_normal(10) for rng in children1]
+        draws2 = [rng.standard_normal(10) for rng in children2]
+
+        np.testing.assert_array_equal(draws1[0], draws2[0])
+        assert not np.array_equal(draws1[0], draws1[1])
+
+    def test_parallel_evaluation_matches_serial(self):
+        """Test that chunked parallel evaluation reproduces the serial outcomes"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'min': 50, 'max': 150})
+        ]
+
+        def outcome_func(values):
+            return values['x'] * values['y']
+
+        serial = MonteCarloEngine(random_seed=42).run_simulation(variables, outcome_func, 1001)
+        parallel = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 1001, n_jobs=4
+        )
+
+        np.testing.assert_array_equal(serial['outcomes'], parallel['outcomes'])
+
+    def test_named_outcome_functions(self):
+        """Test the sum/product outcome helpers on sample views, dicts and scalars"""
+        variables = [
+            Variable("a", DistributionType.NORMAL, {'mean': 10, 'std': 1}),
+            Variable("b", DistributionType.UNIFORM, {'min': 1, 'max': 2}),
+            Variable("c", DistributionType.EXPONENTIAL, {'scale': 3.0})
+        ]
+
+        results = MonteCarloEngine(random_seed=42).run_simulation(variables, sum_of_variables, 1000)
+        samples = results['samples']
+        as_dict = dict(samples)
+
+        np.testing.assert_allclose(results['outcomes'], samples['a'] + samples['b'] + samples['c'], rtol=1e-12)
+        np.testing.assert_allclose(sum_of_variables(as_dict), results['outcomes'], rtol=1e-12)
+        assert sum_of_variables({'a': 1.0, 'b': 2.0}) == 3.0
+        np.testing.assert_array_equal(
+            product_of_variables(samples, ['a', 'c']), samples['a'] * samples['c']
+        )
+
+        # Row reduction over an explicitly built view agrees with the dict/scalar path
+        view = SampleView(np.asfortranarray([[2.0, 3.0, 4.0], [0.5, 10.0, -1.0]]), ['x', 'y', 'z'])
+        np.testing.assert_allclose(product_of_variables(view, ['z', 'x', 'y']), [24.0, -5.0])
+        np.testing.assert_allclose(product_of_variables(view, ['x', 'z']), product_of_variables(dict(view), ['x', 'z']))
+        assert product_of_variables({'x': 2.0, 'y': 3.0}, ['x', 'y']) == 6.0
+        with pytest.raises(KeyError):
+            product_of_variables(view, ['x', 'missing'])
+
+    def test_process_backend_matches_serial(self):
+        """Test that loky worker processes reproduce the serial outcomes for scalar functions"""
+        pytest.importorskip("joblib")
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'min': 50, 'max': 150})
+        ]
+        threshold = 100
+
+        def outcome_func(values):
+            # Closure with scalar branching: pickled by loky, evaluated per simulation
+            return values['y'] if values['x'] > threshold else -values['y']
+
+        serial = MonteCarloEngine(random_seed=42).run_simulation(variables, outcome_func, 501)
+        parallel = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 501, n_jobs=2, backend='loky'
+        )
+
+        np.testing.assert_array_equal(serial['outcomes'], parallel['outcomes'])
+
+        with pytest.raises(ValueError, match="backend"):
+            MonteCarloEngine().run_simulation(variables, outcome_func, 10, backend='dask')
+
+    def test_process_backend_ships_row_chunks(self, monkeypatch):
+        """Test that each loky task carries only its own rows, not the engine or full matrix"""
+        joblib = pytest.importorskip("joblib")
+        import engine.monte_carlo_core as core
+
+        tasks = []
+
+        def recording_delayed(function):
+            def record(*args):
+                tasks.append((function, args))
+                return joblib.delayed(function)(*args)
+            return record
+
+        monkeypatch.setattr(core, "delayed", recording_delayed)
+        variables = [Variable(f"v{i}", DistributionType.NORMAL, {'mean': 0, 'std': 1}) for i in range(3)]
+
+        def outcome_func(values):
+            return values['v0'] + values['v1'] * values['v2']
+
+        results = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 4000, n_jobs=4, backend='loky'
+        )
+
+        assert results['outcomes'].shape == (4000,)
+        assert len(tasks) == 4
+        for function, (_, chunk, size, _) in tasks:
+            assert function is MonteCarloEngine._evaluate_outcomes  # plain function, no bound engine
+            assert size == 1000
+            assert all(column.shape == (1000,) for column in chunk.values())
+
+    def test_samples_are_views_of_one_matrix(self):
+        """Test that results['samples'] maps names to zero-copy columns of the sample matrix"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 0, 'std': 1}),
+            Variable("y", DistributionType.UNIFORM, {'min': 0, 'max': 1})
+        ]
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(variables, lambda values: values['x'] + values['y'], 100)
+        samples = results['samples']
+
+        assert isinstance(samples, SampleView)
+        assert list(samples) == ["x", "y"]
+        assert samples.matrix.shape == (100, 2)
+        assert np.shares_memory(samples['y'], samples.matrix)
+        np.testing.assert_array_equal(samples['y'], samples.matrix[:, 1])
+        np.testing.assert_allclose(results['outcomes'], samples.matrix.sum(axis=1))
+
+    def test_optional_result_arrays(self):
+        """Test that samples/outcomes can be dropped while keeping sensitivity"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.NORMAL, {'mean': 50, 'std': 5})
+        ]
+
+        def outcome_func(values):
+            return 2 * values['x'] + values['y']
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(
+            variables, outcome_func, 1000,
+            return_samples=False, return_outcomes=False, compute_sensitivity=True
+        )
+
+        assert 'samples' not in results
+        assert 'outcomes' not in results
+        assert 'statistics' in results
+        assert results['sensitivity']['x'] > results['sensitivity']['y']
+
+    def test_float32_samples(self):
+        """Test single-precision sample storage"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.NORMAL, {'mean': 50, 'std': 5})
+        ]
+        corr_matrix = np.array([[1.0, 0.5], [0.5, 1.0]])
+
+        def outcome_func(values):
+            return values['x'] + values['y']
+
+        engine = MonteCarloEngine(random_seed=42, dtype=np.float32)
+        results = engine.run_simulation(variables, outcome_func, 1000)
+        correlated = engine.run_simulation(
+            variables, outcome_func, 1000, correlation_matrix=corr_matrix
+        )
+
+        assert results['samples']['x'].dtype == np.float32
+        assert results['outcomes'].dtype == np.float32
+        assert correlated['samples']['y'].dtype == np.float32
+        assert isinstance(results['statistics']['mean'], float)
+        assert abs(results['statistics']['mean'] - 150) < 1
+
+    @pytest.mark.parametrize("qmc", [True, False])
+    def test_precision_override(self, qmc):
+        """Test per-run precision overriding the engine dtype"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'low': 0, 'high': 10}),
+            Variable("z", DistributionType.LOGNORMAL, {'mean': 0, 'sigma': 0.5})
+        ]
+
+        def outcome_func(values):
+            return values['x'] + values['y'] * values['z']
+
+        engine = MonteCarloEngine(random_seed=42, qmc=qmc)
+        results = engine.run_simulation(variables, outcome_func, 2000, precision='float32')
+        default = engine.run_simulation(variables, outcome_func, 2000)
+
+        assert results['samples'].matrix.dtype == np.float32
+        assert results['outcomes'].dtype == np.float32
+        assert default['samples'].matrix.dtype == np.float64
+        assert all(isinstance(v, float) for v in results['percentiles'].values())
+        assert abs(results['statistics']['mean'] - default['statistics']['mean']) < 1
+
+        with pytest.raises(ValueError, match="precision"):
+            engine.run_simulation(variables, outcome_func, 10, precision='float16')
+
+    def test_float32_overflow_warns(self):
+        """Test that non-finite single-precision outcomes raise a warning"""
+        variables = [Variable("x", DistributionType.NORMAL, {'mean': 1e30, 'std': 1e28})]
+
+        engine = MonteCarloEngine(random_seed=42)
+        with np.errstate(over='ignore', invalid='ignore'), pytest.warns(RuntimeWarning, match="float64"):
+            engine.run_simulation(variables, lambda v: v['x'] * v['x'], 100, precision='float32')
+
+    def test_streaming_simulation(self):
+        """Test chunked simulation when no raw arrays are requested"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.NORMAL, {'mean': 50, 'std': 5})
+        ]
+
+        def outcome_func(values):
+            return 2 * values['x'] + values['y']
+
+        for qmc in (True, False):
+            engine = MonteCarloEngine(random_seed=42, qmc=qmc)
+            results = engine.run_simulation(
+                variables, outcome_func, 20000,
+                return_samples=False, return_outcomes=False,
+                compute_sensitivity=True, chunk_size=3000
+            )
+
+            assert results['num_simulations'] == 20000
+            assert results['percentile_sample_size'] <= 3000
+            assert abs(results['statistics']['mean'] - 250) < 1
+            assert abs(results['statistics']['std'] - np.sqrt(425)) < 1
+            assert 240 < results['percentiles']['P50'] < 260
+            assert results['sensitivity']['x'] > results['sensitivity']['y']
+            assert results['sensitivity_method'] == 'subsample'
+
+    def test_streaming_keeps_outcomes(self):
+        """Test chunked sampling that still returns every outcome, with exact percentiles"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'min': 0, 'max': 10})
+        ]
+
+        def outcome_func(values):
+            return values['x'] - values['y']
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(
+            variables, outcome_func, 10000,
+            return_samples=False, compute_sensitivity=True, chunk_size=2048
+        )
+        outcomes = results['outcomes']
+
+        assert 'samples' not in results
+        assert 'percentile_sample_size' not in results
+        assert outcomes.shape == (10000,)
+        assert results['statistics']['mean'] == pytest.approx(outcomes.mean())
+        assert results['percentiles']['P90'] == pytest.approx(np.percentile(outcomes, 90))
+        assert results['sensitivity']['x'] > results['sensitivity']['y']
+        assert results['sensitivity_method'] == 'subsample'
+
+    def test_streaming_is_opt_in(self):
+        """Test that dropping the samples alone never changes results for the same seed"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'min': 0, 'max': 10})
+        ]
+
+        def outcome_func(values):
+            return values['x'] * values['y']
+
+        kept = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 300_000, compute_sensitivity=True
+        )
+        dropped = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 300_000, return_samples=False, compute_sensitivity=True
+        )
+
+        np.testing.assert_array_equal(dropped['outcomes'], kept['outcomes'])
+        assert dropped['statistics'] == kept['statistics']
+        assert dropped['percentiles'] == kept['percentiles']
+        assert dropped['sensitivity'] == kept['sensitivity']
+        assert dropped['sensitivity_method'] == 'exact'
+
+    def test_streaming_matches_unchunked(self):
+        """Test that streaming approximates the unchunked run for the same seed"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.UNIFORM, {'min': 0, 'max': 10})
+        ]
+
+        def outcome_func(values):
+            return values['x'] * values['y']
+
+        exact = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 50_000, return_samples=False, compute_sensitivity=True
+        )
+        streamed = MonteCarloEngine(random_seed=42).run_simulation(
+            variables, outcome_func, 50_000, return_samples=False, compute_sensitivity=True,
+            chunk_size=5000
+        )
+
+        assert streamed['num_simulations'] == exact['num_simulations']
+        assert streamed['statistics']['mean'] == pytest.approx(exact['statistics']['mean'], rel=0.01)
+        assert streamed['statistics']['std'] == pytest.approx(exact['statistics']['std'], rel=0.02)
+        assert streamed['percentiles']['P50'] == pytest.approx(exact['percentiles']['P50'], rel=0.02)
+        for name in ('x', 'y'):
+            assert streamed['sensitivity'][name] == pytest.approx(exact['sensitivity'][name], abs=0.05)
+        assert exact['sensitivity_method'] == 'exact'
+        assert streamed['sensitivity_method'] == 'subsample'
+
     def test_statistics_calculation(self):
         """Test statistical measures calculation"""
         variables = [
@@ -117,11 +645,7 @@ class TestMonteCarloEngine:
         results = engine.run_simulation(variables, outcome_func, 1000)
 
         stats = results['statistics']
-        assert 'mean' in stats
-        assert 'std' in stats
-        assert 'min' in stats
-        assert 'max' in stats
-        assert 'variance' in stats
+        assert stats.keys() >= {"mean", "std", "min", "max", "variance"}
 
         # Check mean is close to expected
         assert 95 < stats['mean'] < 105
@@ -139,13 +663,28 @@ class TestMonteCarloEngine:
         results = engine.run_simulation(variables, outcome_func, 1000)
 
         percentiles = results['percentiles']
-        assert 'P10' in percentiles
-        assert 'P50' in percentiles
-        assert 'P90' in percentiles
+        assert percentiles.keys() >= {"P10", "P50", "P90"}
 
         # P50 should be close to mean for normal distribution
         assert abs(percentiles['P50'] - results['statistics']['mean']) < 2
 
+        # The median comes from the same partition as the percentiles
+        assert results['statistics']['median'] == percentiles['P50']
+        assert results['statistics']['median'] == pytest.approx(np.median(results['outcomes']))
+
+    def test_percentiles_match_numpy(self):
+        """Test that partition-based percentiles match np.percentile"""
+        outcomes = np.random.default_rng(42).lognormal(0, 1, 1001)
+        engine = MonteCarloEngine()
+
+        percentiles = engine._calculate_percentiles(outcomes)
+        for key, value in percentiles.items():
+            assert value == pytest.approx(np.percentile(outcomes, float(key[1:])))
+
+        lower, upper = engine.calculate_confidence_interval(outcomes, 0.95)
+        assert lower == pytest.approx(np.percentile(outcomes, 2.5))
+        assert upper == pytest.approx(np.percentile(outcomes, 97.5))
+
     def test_sensitivity_analysis(self):
         """Test sensitivity analysis calculation"""
         variables = [
@@ -160,15 +699,39 @@ class TestMonteCarloEngine:
         engine = MonteCarloEngine(random_seed=42)
         results = engine.run_simulation(variables, outcome_func, 1000)
 
-        sensitivity = engine.sensitivity_analysis(
-            variables, outcome_func, results['outcomes'], results['samples']
-        )
+        sensitivity = engine.sensitivity_analysis(results['outcomes'], results['samples'])
 
-        assert 'x' in sensitivity
-        assert 'y' in sensitivity
+        assert sensitivity.keys() >= {"x", "y"}
         # x should have higher influence than y
         assert sensitivity['x'] > sensitivity['y']
 
+        # Any name -> samples mapping works, not just the engine's SampleView
+        assert engine.sensitivity_analysis(results['outcomes'], dict(results['samples'])) == sensitivity
+
+    def test_sensitivity_matches_spearman(self):
+        """Test that vectorized rank correlations match scipy's spearmanr"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 0, 'std': 1}),
+            Variable("y", DistributionType.UNIFORM, {'min': 0, 'max': 1}),
+            Variable("z", DistributionType.TRIANGULAR, {'left': 0, 'mode': 1, 'right': 3})
+        ]
+
+        def outcome_func(values):
+            # Rounding introduces ties in the outcome ranks
+            return values['x'] * values['y'] + np.round(values['z'])
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(variables, outcome_func, 2000, compute_sensitivity=True)
+
+        sensitivity = engine.sensitivity_analysis(results['outcomes'], results['samples'])
+
+        for var in variables:
+            expected = stats.spearmanr(results['samples'][var.name], results['outcomes'])[0] ** 2
+            assert sensitivity[var.name] == pytest.approx(expected)
+
+        # The in-run result, computed on the sample matrix, agrees exactly
+        assert results['sensitivity'] == sensitivity
+
     def test_confidence_interval(self):
         """Test confidence interval calculation"""
         outcomes = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
@@ -206,6 +769,98 @@ class TestMonteCarloEngine:
 
         assert correlation > 0.5  # Should be positively correlated
 
+    @pytest.mark.parametrize("corr_matrix", [
+        np.array([[1.0, 0.9], [0.2, 1.0]]),  # Not symmetric
+        np.array([[1.0, 1.5], [1.5, 1.0]]),  # Not positive definite
+        np.eye(3),  # Wrong shape for two variables
+    ])
+    def test_invalid_correlation_matrix(self, corr_matrix):
+        """Test that invalid correlation matrices are rejected"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.NORMAL, {'mean': 50, 'std': 5})
+        ]
+
+        def outcome_func(values):
+            return values['x'] + values['y']
+
+        engine = MonteCarloEngine(random_seed=42)
+        with pytest.raises(ValueError):
+            engine.run_simulation(variables, outcome_func, 100, correlation_matrix=corr_matrix)
+
+    def test_cholesky_factor_is_cached(self):
+        """Test that repeated runs with the same correlation matrix reuse the factor, across engines"""
+        variables = [
+            Variable("x", DistributionType.NORMAL, {'mean': 100, 'std': 10}),
+            Variable("y", DistributionType.NORMAL, {'mean': 50, 'std': 5})
+        ]
+        corr_matrix = np.array([[1.0, 0.3], [0.3, 1.0]])
+
+        def outcome_func(values):
+            return values['x'] + values['y']
+
+        engine = MonteCarloEngine(random_seed=42)
+        engine.run_simulation(variables, outcome_func, 100, correlation_matrix=corr_matrix)
+        hits = _cholesky_cached.cache_info().hits
+        engine.run_simulation(variables, outcome_func, 100, correlation_matrix=corr_matrix.copy())
+        MonteCarloEngine(random_seed=7).run_simulation(variables, outcome_func, 100, correlation_matrix=corr_matrix)
+
+        assert _cholesky_cached.cache_info().hits == hits + 2
+
+    @pytest.mark.parametrize("dtype", [np.float64, np.float32])
+    def test_all_normal_correlation_fast_path(self, dtype):
+        """Test that all-normal correlated draws hit the target means and covariance"""
+        means = np.array([100.0, 50.0, -5.0])
+        stds = np.array([10.0, 5.0, 2.0])
+        corr_matrix = np.array([
+            [1.0, 0.6, -0.3],
+            [0.6, 1.0, 0.2],
+            [-0.3, 0.2, 1.0]
+        ])
+        variables = [
+            Variable(name, DistributionType.NORMAL, {'mean': m, 'std': sd})
+            for name, m, sd in zip("abc", means, stds)
+        ]
+
+        engine = MonteCarloEngine(random_seed=42, dtype=dtype)
+        results = engine.run_simulation(
+            variables, lambda values: values['a'], 8192, correlation_matrix=corr_matrix
+        )
+        matrix = np.column_stack([results['samples'][name] for name in "abc"])
+
+        assert matrix.dtype == dtype
+        np.testing.assert_allclose(matrix.mean(axis=0), means, atol=0.05)
+        np.testing.assert_allclose(np.cov(matrix, rowvar=False), np.outer(stds, stds) * corr_matrix,
+                                   rtol=0.05, atol=0.2)
+
+    def test_correlation_with_non_normal_marginals(self):
+        """Test that the copula correlates non-normal variables and keeps their marginals"""
+        variables = [
+            Variable("x", DistributionType.UNIFORM, {'min': 0, 'max': 10}),
+            Variable("y", DistributionType.LOGNORMAL, {'mean': 0, 'sigma': 0.5}),
+            Variable("z", DistributionType.GAMMA, {'shape': 2, 'scale': 1})
+        ]
+        corr_matrix = np.array([
+            [1.0, 0.8, -0.5],
+            [0.8, 1.0, -0.4],
+            [-0.5, -0.4, 1.0]
+        ])
+
+        def outcome_func(values):
+            return values['x'] + values['y'] + values['z']
+
+        engine = MonteCarloEngine(random_seed=42)
+        results = engine.run_simulation(
+            variables, outcome_func, 2000, correlation_matrix=corr_matrix
+        )
+        samples = results['samples']
+
+        assert 0 <= np.min(samples['x']) and np.max(samples['x']) <= 10
+        assert np.min(samples['y']) > 0
+        assert np.min(samples['z']) > 0
+        assert stats.spearmanr(samples['x'], samples['y'])[0] > 0.6
+        assert stats.spearmanr(samples['x'], samples['z'])[0] < -0.3
+
 
 class TestHelperFunctions:
     """Test helper functions"""
@@ -8,8 +8,91 @@ DMCA-Free: Original work
 """
 
 import numpy as np
+from bisect import bisect_right
+from functools import partial
+from itertools import islice
 from typing import Dict, Any, List, Optional
-from engine.monte_carlo_core import MonteCarloEngine, Variable, DistributionType
+from engine.monte_carlo_core import MonteCarloEngine, SampleView, Variable, DistributionType
+from engine.kernels import NUMBA_AVAILABLE, njit, prange
+
+# Interpretation bands: levels[i] covers bins[i-1] <= probability < bins[i]
+_PROFIT_BINS = (0.6, 0.8)
+_PROFIT_LEVELS = ("LOW", "MODERATE", "HIGH")
+
+_ROI_BINS = (0.7,)
+_ROI_LEVELS = ("Limited", "Strong")
+
+
+def _compounded_revenue_sum(growth_rate, churn_rate, time_horizon: int):
+    """
+    Sum of revenue multipliers g + g^2 + ... + g^H with g = (1 + growth) * (1 - churn)
+
+    Closed-form geometric series, evaluated as expm1(H * log1p(g - 1)) / (g - 1)
+    so there is no cancellation as g approaches 1 (where the sum tends to H).
+    """
+    growth_rate = np.asarray(growth_rate, dtype=float)
+    churn_rate = np.asarray(churn_rate, dtype=float)
+    # g - 1 expanded, so it stays exact for small rates
+    rate = growth_rate - churn_rate - growth_rate * churn_rate
+    factor = 1.0 + rate
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # log1p needs g > 0; shrinking or sign-flipping revenue takes the direct power
+        growth_minus_one = np.where(
+            factor > 0,
+            np.expm1(time_horizon * np.log1p(np.maximum(rate, -1.0))),
+            np.power(factor, time_horizon) - 1.0
+        )
+        series = np.divide(
+            growth_minus_one, rate,
+            out=np.full(np.broadcast(rate, growth_minus_one).shape, float(time_horizon)),
+            where=rate != 0
+        )
+
+    return factor * series
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _seasonal_revenue_kernel(growth_rate, churn_rate, seasonality, time_horizon):
+    """Sum over periods of g^t * seasonality[t]: parallel over simulations, sequential over periods"""
+    n = growth_rate.shape[0]
+    season_length = seasonality.shape[0]
+    total = np.empty(n)
+    for i in prange(n):
+        factor = (1.0 + growth_rate[i]) * (1.0 - churn_rate[i])
+        trend = 1.0
+        acc = 0.0
+        for t in range(time_horizon):
+            trend *= factor
+            acc += trend * seasonality[t % season_length]
+        total[i] = acc
+    return total
+
+
+def _seasonal_revenue_sum(growth_rate, churn_rate, seasonality: np.ndarray, time_horizon: int):
+    """
+    Sum of compounded revenue multipliers with a repeating per-period seasonality
+
+    Seasonality scales each period's revenue without compounding, which breaks
+    the geometric series, so the period loop runs in a compiled kernel (NumPy
+    loop over periods without Numba).
+    """
+    growth_rate, churn_rate = np.broadcast_arrays(
+        np.asarray(growth_rate, dtype=float), np.asarray(churn_rate, dtype=float)
+    )
+    if NUMBA_AVAILABLE:
+        return _seasonal_revenue_kernel(
+            np.ascontiguousarray(growth_rate.ravel()), np.ascontiguousarray(churn_rate.ravel()),
+            seasonality, time_horizon
+        ).reshape(growth_rate.shape)
+
+    factor = (1 + growth_rate) * (1 - churn_rate)
+    trend = np.ones_like(factor)
+    total = np.zeros_like(factor)
+    for t in range(time_horizon):
+        trend = trend * factor
+        total += trend * seasonality[t % len(seasonality)]
+    return total
 
 
 def run_business_scenario(
@@ -18,7 +101,8 @@ def run_business_scenario(
     cost_structure: Dict[str, Any],
     time_horizon: int,
     num_simulations: int = 10000,
-    random_seed: Optional[int] = None
+    random_seed: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None
 ) -> Dict[str, Any]:
     """
     Run business scenario Monte Carlo simulation
@@ -41,6 +125,7 @@ def run_business_scenario(
         time_horizon: Number of periods (months/quarters/years)
         num_simulations: Number of Monte Carlo iterations
         random_seed: Optional seed for reproducibility
+        rng: Optional Generator to draw from; takes precedence over random_seed
 
     Returns:
         Comprehensive scenario analysis
@@ -87,85 +172,94 @@ def run_business_scenario(
             params={'mean': cr.get('mean', 0.1), 'std': cr.get('std', 0.03)}
         ))
 
-    def scenario_outcome(values: Dict[str, float]) -> float:
-        """Calculate total profit over time horizon"""
-        base_revenue = revenue_assumptions.get('base_revenue', 100000)
-        fixed_costs = cost_structure.get('fixed_costs', 50000)
+    seasonality = revenue_assumptions.get('seasonality')
+    if seasonality is not None:
+        seasonality = np.asarray(seasonality, dtype=float)
+        if seasonality.ndim != 1 or len(seasonality) == 0:
+            raise ValueError("seasonality must be a non-empty list of per-period multipliers")
+
+    # Specialize the profit model for this scenario once: the constants, the
+    # horizon and the revenue model are bound here instead of on every call.
+    # Revenue compounds by (1 + growth) * (1 - churn) each period, so without
+    # seasonality the period-by-period sum collapses to a geometric series
+    base_revenue = revenue_assumptions.get('base_revenue', 100000)
+    total_fixed_costs = cost_structure.get('fixed_costs', 50000) * time_horizon
+    if seasonality is None:
+        revenue_sum = partial(_compounded_revenue_sum, time_horizon=time_horizon)
+    else:
+        revenue_sum = partial(_seasonal_revenue_sum, seasonality=seasonality, time_horizon=time_horizon)
+
+    def scenario_outcome(values: Dict[str, np.ndarray]) -> np.ndarray:
+        """Calculate total profit over time horizon for all simulations at once"""
         growth_rate = values.get('growth_rate', 0.05)
         variable_cost_pct = values.get('variable_cost_pct', 0.5)
         churn_rate = values.get('churn_rate', 0)
 
-        total_profit = 0
-        current_revenue = base_revenue
-
-        for period in range(time_horizon):
-            # Apply growth and churn
-            current_revenue = current_revenue * (1 + growth_rate) * (1 - churn_rate)
+        total_revenue = base_revenue * revenue_sum(growth_rate, churn_rate)
+        profit = total_revenue * (1 - variable_cost_pct) - total_fixed_costs
 
-            # Calculate costs
-            variable_costs = current_revenue * variable_cost_pct
-            total_costs = fixed_costs + variable_costs
-
-            # Calculate profit
-            period_profit = current_revenue - total_costs
-            total_profit += period_profit
-
-        return total_profit
+        # With no uncertain inputs every term is a default scalar: repeat it per
+        # simulation (streamed runs pass chunks, so size it from the sample rows)
+        if np.ndim(profit) == 0:
+            rows = values.matrix.shape[0] if isinstance(values, SampleView) else num_simulations
+            profit = np.full(rows, profit)
+        return profit
 
     # Run simulation
-    engine = MonteCarloEngine(random_seed=random_seed)
+    engine = MonteCarloEngine(random_seed=rng if rng is not None else random_seed)
     results = engine.run_simulation(
         variables=variables,
         outcome_function=scenario_outcome,
-        num_simulations=num_simulations
+        num_simulations=num_simulations,
+        return_samples=False,
+        compute_sensitivity=True,
+        vectorized=True
     )
 
     # Calculate business-specific metrics
     outcomes = results['outcomes']
 
     # Probability of profitability
-    profit_probability = np.sum(outcomes > 0) / num_simulations
+    profit_probability = np.count_nonzero(outcomes > 0) / num_simulations
 
     # Calculate ROI if initial investment provided
     if 'initial_investment' in revenue_assumptions:
         initial_inv = revenue_assumptions['initial_investment']
         roi = (outcomes - initial_inv) / initial_inv
         roi_stats = {
-            'mean_roi': float(np.mean(roi)),
-            'median_roi': float(np.median(roi)),
-            'prob_positive_roi': float(np.sum(roi > 0) / num_simulations)
+            # ROI is affine in the outcome, so its mean and median map from the
+            # engine's statistics without further passes over the ROI array
+            'mean_roi': float((results['statistics']['mean'] - initial_inv) / initial_inv),
+            'median_roi': float((results['percentiles']['P50'] - initial_inv) / initial_inv),
+            'prob_positive_roi': float(np.count_nonzero(roi > 0) / num_simulations)
         }
     else:
         roi_stats = None
 
-    # Risk metrics
-    downside_risk = np.percentile(outcomes, 10)  # P10 outcome
-    upside_potential = np.percentile(outcomes, 90)  # P90 outcome
+    # Risk metrics, reusing the engine's single-pass percentiles (already Python floats)
+    percentiles = results['percentiles']
+    downside_risk = percentiles['P10']
+    upside_potential = percentiles['P90']
 
     return {
         'scenario_name': scenario_name,
         'time_horizon': time_horizon,
-        'expected_total_profit': float(results['statistics']['mean']),
+        'expected_total_profit': results['statistics']['mean'],
         'probability_of_profitability': float(profit_probability),
         'percentile_outcomes': {
-            'pessimistic_P10': float(results['percentiles']['P10']),
-            'most_likely_P50': float(results['percentiles']['P50']),
-            'optimistic_P90': float(results['percentiles']['P90'])
+            'pessimistic_P10': downside_risk,
+            'most_likely_P50': percentiles['P50'],
+            'optimistic_P90': upside_potential
         },
         'risk_metrics': {
-            'downside_risk': float(downside_risk),
-            'upside_potential': float(upside_potential),
-            'outcome_range': float(upside_potential - downside_risk)
+            'downside_risk': downside_risk,
+            'upside_potential': upside_potential,
+            'outcome_range': upside_potential - downside_risk
         },
         'roi_analysis': roi_stats,
         'statistics': results['statistics'],
         'num_simulations': num_simulations,
-        'sensitivity': engine.sensitivity_analysis(
-            variables=variables,
-            outcome_function=scenario_outcome,
-            outcomes=outcomes,
-            samples=results['samples']
-        ),
+        'sensitivity': results['sensitivity'],
         'interpretation': _interpret_scenario_results(
             profit_probability,
             results['statistics']['mean'],
@@ -218,13 +312,14 @@ def run_sensitivity_analysis(
                 'impact': float(abs(variance))  # For tornado diagram
             }
 
-    # Sort by impact
+    # Sort by impact; the tornado diagram needs the full order, so the top-3
+    # key drivers are read off the front instead of being selected separately
     sorted_results = dict(
         sorted(sensitivity_results.items(), key=lambda x: x[1]['impact'], reverse=True)
     )
 
     # Identify key drivers (top 3)
-    key_drivers = list(sorted_results.keys())[:3]
+    key_drivers = list(islice(sorted_results, 3))
 
     return {
         'base_simulation_id': base_simulation_id,
@@ -245,12 +340,8 @@ def _interpret_scenario_results(
     interpretation_parts = []
 
     # Profitability assessment
-    if profit_prob >= 0.8:
-        interpretation_parts.append(f"HIGH probability ({profit_prob*100:.0f}%) of profitability")
-    elif profit_prob >= 0.6:
-        interpretation_parts.append(f"MODERATE probability ({profit_prob*100:.0f}%) of profitability")
-    else:
-        interpretation_parts.append(f"LOW probability ({profit_prob*100:.0f}%) of profitability")
+    level = _PROFIT_LEVELS[bisect_right(_PROFIT_BINS, profit_prob)]
+    interpretation_parts.append(f"{level} probability ({profit_prob*100:.0f}%) of profitability")
 
     # Expected value assessment
     if expected_profit > 0:
@@ -261,9 +352,7 @@ def _interpret_scenario_results(
     # ROI assessment
     if roi_stats and 'prob_positive_roi' in roi_stats:
         roi_prob = roi_stats['prob_positive_roi']
-        if roi_prob >= 0.7:
-            interpretation_parts.append(f"Strong ROI potential ({roi_prob*100:.0f}% prob)")
-        else:
-            interpretation_parts.append(f"Limited ROI potential ({roi_prob*100:.0f}% prob)")
+        level = _ROI_LEVELS[bisect_right(_ROI_BINS, roi_prob)]
+        interpretation_parts.append(f"{level} ROI potential ({roi_prob*100:.0f}% prob)")
 
     return ". ".join(interpretation_parts)
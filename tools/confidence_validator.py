@@ -7,9 +7,39 @@ Licensed under the MIT License - see LICENSE file for details
 DMCA-Free: Original work
 """
 
+import operator
 import numpy as np
+from bisect import bisect_right
 from typing import Dict, Any, List, Optional
-from engine.monte_carlo_core import MonteCarloEngine, Variable, DistributionType, create_variable_from_dict
+from engine.monte_carlo_core import (
+    MonteCarloEngine,
+    Variable,
+    DistributionType,
+    create_variable_from_dict,
+    product_of_variables,
+    sum_of_variables
+)
+
+# Qualitative bands: labels[i] covers bins[i-1] <= value < bins[i]
+_CONFIDENCE_BINS = (0.4, 0.6, 0.75, 0.9)
+_CONFIDENCE_LABELS = ("VERY LOW", "LOW", "MODERATE", "HIGH", "VERY HIGH")
+
+_ROBUSTNESS_BINS = (0.5, 0.75, 0.9)
+_ROBUSTNESS_LABELS = (
+    "FRAGILE (answer highly sensitive to assumptions)",
+    "SOMEWHAT FRAGILE (answer changes in many scenarios)",
+    "MODERATELY ROBUST (answer mostly stable)",
+    "ROBUST (answer stable across scenarios)",
+)
+
+
+# Success criteria operators, keyed by their 'comparison' spelling
+_COMPARISONS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+}
 
 
 def validate_reasoning_confidence(
@@ -73,53 +103,44 @@ def validate_reasoning_confidence(
             variables.append(var)
 
     # Define outcome function based on decision context
-    def outcome_function(values: Dict[str, float]) -> float:
+    def outcome_function(values: Dict[str, np.ndarray]) -> np.ndarray:
         """
-        Calculate outcome based on variable values
+        Calculate outcomes based on arrays of variable values
         This is a simplified model - can be customized per use case
         """
         # Example: revenue = market_size * conversion_rate * price
         if 'market_size' in values and 'conversion_rate' in values:
             if 'price' in values:
-                return values['market_size'] * values['conversion_rate'] * values['price']
+                return product_of_variables(values, ['market_size', 'conversion_rate', 'price'])
             elif 'revenue_per_customer' in values:
-                return values['market_size'] * values['conversion_rate'] * values['revenue_per_customer']
+                return product_of_variables(values, ['market_size', 'conversion_rate', 'revenue_per_customer'])
 
         # Generic sum of values for other cases
-        return sum(values.values())
+        return sum_of_variables(values)
 
     # Run Monte Carlo simulation
     engine = MonteCarloEngine(random_seed=random_seed)
     results = engine.run_simulation(
         variables=variables,
         outcome_function=outcome_function,
-        num_simulations=num_simulations
+        num_simulations=num_simulations,
+        return_samples=False,
+        # Rank sensitivity from the drawn samples and outcomes, inside the same run
+        compute_sensitivity=True
     )
 
     # Calculate success probability based on criteria
     threshold = success_criteria.get('threshold', 0)
     comparison = success_criteria.get('comparison', '>=')
 
-    if comparison == '>=':
-        success_count = np.sum(results['outcomes'] >= threshold)
-    elif comparison == '>':
-        success_count = np.sum(results['outcomes'] > threshold)
-    elif comparison == '<=':
-        success_count = np.sum(results['outcomes'] <= threshold)
-    elif comparison == '<':
-        success_count = np.sum(results['outcomes'] < threshold)
-    else:
-        success_count = np.sum(results['outcomes'] >= threshold)  # default
+    # Unknown operators fall back to '>='
+    compare = _COMPARISONS.get(comparison, operator.ge)
+    success_count = np.count_nonzero(compare(results['outcomes'], threshold))
 
     confidence_level = success_count / num_simulations
 
-    # Calculate sensitivity
-    sensitivity = engine.sensitivity_analysis(
-        variables=variables,
-        outcome_function=outcome_function,
-        outcomes=results['outcomes'],
-        samples=results['samples']
-    )
+    # Sensitivity was computed in the run, from the same samples and outcomes
+    sensitivity = results['sensitivity']
 
     # Determine confidence qualifier
     confidence_qualifier = _interpret_confidence(confidence_level)
@@ -171,39 +192,43 @@ def test_assumption_robustness(
     # Create variables from critical assumptions
     variables = [create_variable_from_dict(a) for a in critical_assumptions]
 
-    # Simple outcome function (can be customized)
-    def outcome_function(values: Dict[str, float]) -> float:
-        return sum(values.values())
-
-    # Run simulation
+    # Run simulation (simple sum outcome; can be customized)
     engine = MonteCarloEngine(random_seed=random_seed)
     results = engine.run_simulation(
         variables=variables,
-        outcome_function=outcome_function,
+        outcome_function=sum_of_variables,
         num_simulations=num_scenarios
     )
 
     # Analyze where answer might change
     # This is simplified - in practice would need more sophisticated logic
+    # The engine's summary statistics already cover the median, spread and range,
+    # so no further passes over the outcomes are needed for them
     outcomes = results['outcomes']
-    threshold = np.median(outcomes)  # Assume base answer is at median
+    statistics = results['statistics']
+    threshold = statistics['median']  # Assume base answer is at median
 
     # Find scenarios where outcome is significantly different
-    significant_deviation = np.std(outcomes) * 1.5
-    breaking_scenarios = np.abs(outcomes - threshold) > significant_deviation
+    significant_deviation = statistics['std'] * 1.5
+    deviation = np.abs(outcomes - threshold)
+    num_breaking = int(np.count_nonzero(deviation > significant_deviation))
 
+    # Top 5 breaking scenarios (largest deviation first), selected in O(N)
+    # with argpartition instead of materializing and scanning a mask
     breaking_points = []
-    if np.any(breaking_scenarios):
-        indices = np.where(breaking_scenarios)[0][:5]  # Top 5 breaking scenarios
+    top = min(num_breaking, 5)
+    if top:
+        indices = np.argpartition(deviation, -top)[-top:]
+        indices = indices[np.argsort(deviation[indices])[::-1]]
         for idx in indices:
-            scenario = {var.name: float(results['samples'][var.name][idx]) for var in variables}
+            scenario = dict(zip(results['samples'].names, results['samples'].matrix[idx].tolist()))
             breaking_points.append({
                 'scenario': scenario,
                 'outcome': float(outcomes[idx]),
                 'deviation_from_base': float(outcomes[idx] - threshold)
             })
 
-    robustness_score = 1.0 - (np.sum(breaking_scenarios) / num_scenarios)
+    robustness_score = 1.0 - num_breaking / num_scenarios
 
     return {
         'base_answer': base_answer,
@@ -212,37 +237,22 @@ def test_assumption_robustness(
         'confidence_qualifier': _interpret_robustness(robustness_score),
         'num_scenarios_tested': num_scenarios,
         'stress_test_summary': {
-            'stable_scenarios': int(np.sum(~breaking_scenarios)),
-            'unstable_scenarios': int(np.sum(breaking_scenarios)),
-            'outcome_range': [float(np.min(outcomes)), float(np.max(outcomes))]
+            'stable_scenarios': num_scenarios - num_breaking,
+            'unstable_scenarios': num_breaking,
+            'outcome_range': [statistics['min'], statistics['max']]
         }
     }
 
 
 def _interpret_confidence(confidence: float) -> str:
     """Interpret confidence level as qualitative assessment"""
-    if confidence >= 0.9:
-        return "VERY HIGH"
-    elif confidence >= 0.75:
-        return "HIGH"
-    elif confidence >= 0.6:
-        return "MODERATE"
-    elif confidence >= 0.4:
-        return "LOW"
-    else:
-        return "VERY LOW"
+    # bisect_right puts a value equal to a bin edge in the higher band (>=)
+    return _CONFIDENCE_LABELS[bisect_right(_CONFIDENCE_BINS, confidence)]
 
 
 def _interpret_robustness(robustness: float) -> str:
     """Interpret robustness score"""
-    if robustness >= 0.9:
-        return "ROBUST (answer stable across scenarios)"
-    elif robustness >= 0.75:
-        return "MODERATELY ROBUST (answer mostly stable)"
-    elif robustness >= 0.5:
-        return "SOMEWHAT FRAGILE (answer changes in many scenarios)"
-    else:
-        return "FRAGILE (answer highly sensitive to assumptions)"
+    return _ROBUSTNESS_LABELS[bisect_right(_ROBUSTNESS_BINS, robustness)]
 
 
 def _identify_key_risks(
@@ -250,21 +260,23 @@ def _identify_key_risks(
     assumptions: Dict[str, Any],
     threshold: float = 0.15
 ) -> List[Dict[str, Any]]:
-    """Identify key risk factors based on sensitivity analysis"""
+    """Identify key risk factors based on sensitivity analysis, strongest first"""
+    above_threshold = [item for item in sensitivity.items() if item[1] > threshold]
+    ranked = sorted(above_threshold, key=operator.itemgetter(1), reverse=True)
+
     key_risks = []
 
-    for var_name, influence in sensitivity.items():
-        if influence > threshold:
-            risk_info = {
-                'variable': var_name,
-                'influence': float(influence),
-                'description': f"{var_name} has {influence*100:.1f}% influence on outcome"
-            }
+    for var_name, influence in ranked:
+        risk_info = {
+            'variable': var_name,
+            'influence': float(influence),
+            'description': f"{var_name} has {influence*100:.1f}% influence on outcome"
+        }
 
-            # Add distribution info if available
-            if var_name in assumptions:
-                risk_info['distribution'] = assumptions[var_name].get('distribution', 'unknown')
+        # Add distribution info if available
+        if var_name in assumptions:
+            risk_info['distribution'] = assumptions[var_name].get('distribution', 'unknown')
 
-            key_risks.append(risk_info)
+        key_risks.append(risk_info)
 
     return key_risks